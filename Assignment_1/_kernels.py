@@ -0,0 +1,114 @@
+"""Numeric kernels for postings coding, intersection and scoring.
+
+Compiled with numba when it is installed; otherwise the numpy fallbacks are used.
+"""
+import numpy as np
+
+# numba is optional; fall back to plain Python / numpy when it is not installed
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+@njit(cache=True, fastmath=True)
+def _accumulate_scores(doc_ords: np.ndarray, scores: np.ndarray, n_docs: int) -> np.ndarray:
+    """Sum per-posting scores into a dense per-document accumulator."""
+    totals = np.zeros(n_docs, dtype=np.float64)
+    for i in range(doc_ords.shape[0]):
+        totals[doc_ords[i]] += scores[i]
+    return totals
+
+@njit(cache=True)
+def _intersect_kernel(a: np.ndarray, b: np.ndarray, out: np.ndarray, use_skips: bool) -> int:
+    """Two-pointer intersection of sorted arrays into out, returning the match count.
+    
+    With use_skips, a pointer jumps sqrt(n) entries ahead while the skip target
+    does not pass the other list's current doc id.
+    """
+    len_a, len_b = a.shape[0], b.shape[0]
+    skip_a = max(int(np.sqrt(len_a)), 1) if use_skips else 0
+    skip_b = max(int(np.sqrt(len_b)), 1) if use_skips else 0
+    
+    i = j = k = 0
+    while i < len_a and j < len_b:
+        if a[i] == b[j]:
+            out[k] = a[i]
+            k += 1
+            i += 1
+            j += 1
+        elif a[i] < b[j]:
+            if skip_a and i + skip_a < len_a and a[i + skip_a] <= b[j]:
+                while i + skip_a < len_a and a[i + skip_a] <= b[j]:
+                    i += skip_a
+            else:
+                i += 1
+        else:
+            if skip_b and j + skip_b < len_b and b[j + skip_b] <= a[i]:
+                while j + skip_b < len_b and b[j + skip_b] <= a[i]:
+                    j += skip_b
+            else:
+                j += 1
+    return k
+
+# With skip pointers, a list at least this many times shorter than the other is
+# intersected by searching the longer list instead of merging the two
+_SEARCH_RATIO = 32
+
+def _search_intersect(short: np.ndarray, long: np.ndarray) -> np.ndarray:
+    """Intersect by binary searching the longer list for each doc of the shorter, O(k log n)."""
+    idx = np.minimum(np.searchsorted(long, short), len(long) - 1)
+    return short[long[idx] == short] if len(long) else short[:0]
+
+def intersect_sorted(a: np.ndarray, b: np.ndarray, use_skips: bool = False) -> np.ndarray:
+    """Intersect two sorted arrays of unique doc ids.
+    
+    Args:
+        a, b: Sorted int32 doc id arrays
+        use_skips: Skip through the longer list: sqrt(n) skip pointers during the
+            merge, or a binary search descent when one list is much shorter
+    """
+    if use_skips:
+        short, long = (a, b) if len(a) <= len(b) else (b, a)
+        if len(short) * _SEARCH_RATIO <= len(long):
+            return _search_intersect(short, long)
+    
+    if not HAVE_NUMBA:
+        return np.intersect1d(a, b, assume_unique=True)
+    out = np.empty(min(a.shape[0], b.shape[0]), dtype=np.int32)
+    return out[:_intersect_kernel(a, b, out, use_skips)]
+
+# Stream VByte: one 2-bit length code (1-4 bytes) per value, four codes per
+# control byte, followed by the values' little-endian bytes. Keeping the
+# lengths apart from the data lets both directions run as whole-array numpy ops
+_BYTE_SLOTS = np.arange(4)
+_CODE_SHIFTS = np.array([0, 2, 4, 6], dtype=np.uint8)
+
+def streamvbyte_encode(values: np.ndarray) -> bytes:
+    """Stream VByte encode non-negative ints below 2**32 as control bytes || data bytes."""
+    values = np.ascontiguousarray(values, dtype='<u4')
+    n = values.shape[0]
+    lengths = 1 + (values > 0xFF).astype(np.uint8) + (values > 0xFFFF) + (values > 0xFFFFFF)
+    
+    codes = np.zeros(-(-n // 4) * 4, dtype=np.uint8)
+    codes[:n] = lengths - 1
+    control = np.bitwise_or.reduce(codes.reshape(-1, 4) << _CODE_SHIFTS, axis=1).astype(np.uint8)
+    
+    data = values.view(np.uint8).reshape(n, 4)[_BYTE_SLOTS < lengths[:, None]]
+    return control.tobytes() + data.tobytes()
+
+def streamvbyte_decode(buf: bytes, count: int) -> np.ndarray:
+    """Decode count values written by streamvbyte_encode."""
+    stream = np.frombuffer(buf, dtype=np.uint8)
+    control_len = -(-count // 4)
+    
+    codes = ((stream[:control_len, None] >> _CODE_SHIFTS) & 3).reshape(-1)[:count]
+    used = _BYTE_SLOTS <= codes[:, None]
+    
+    out = np.zeros((count, 4), dtype=np.uint8)
+    out[used] = stream[control_len:control_len + int(used.sum())]
+    return out.view('<u4').reshape(count).astype(np.int64)
@@ -1,18 +1,56 @@
 import time
 import json
+import os
+import socket
+import threading
 import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from itertools import islice
 from pathlib import Path
-from typing import List, Dict
-import numpy as np
-from data_loader import get_all_documents
-from es_index import MyElasticsearchIndex
-from self_index import MySelfIndex
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+DOCS_CACHE_DIR = Path("data")
+
+class RSSMonitor:
+    """Track peak resident set size by polling from a background thread."""
+    
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        import psutil
+        self.process = psutil.Process()
+        self._stop = threading.Event()
+        self._thread = None
+        self.start_rss = 0
+        self.peak_rss = 0
+    
+    def _poll(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+    
+    def start(self):
+        self.start_rss = self.process.memory_info().rss
+        self.peak_rss = self.start_rss
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._poll, daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> int:
+        """Stop polling and return peak RSS growth in bytes."""
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+        return self.peak_rss - self.start_rss
 
 class Benchmark:
     """Benchmark different index configurations."""
     
-    def __init__(self, query_file: str = "diverse-queries.json"):
+    def __init__(self, query_file: str = "diverse-queries.json", max_workers: int = 16,
+                 memprofile: bool = False, warmup_iters: int = 1, repeats: int = 20):
         self.query_file = query_file
+        self.max_workers = max_workers
+        self.memprofile = memprofile
+        self.warmup_iters = warmup_iters
+        self.repeats = repeats
         self.results = []
         
         # Load queries
@@ -30,26 +68,48 @@ class Benchmark:
             ]
             print(f"Query file not found, using default queries")
     
-    def collect_documents(self, max_docs: int = 1000):
-        """Collect documents for indexing."""
+    def collect_documents(self, max_docs: int = 1000) -> Path:
+        """Collect documents for indexing into an on-disk JSONL cache.
+        
+        Returns:
+            Path of the cache file, reused on later runs with the same max_docs
+        """
+        cache_file = DOCS_CACHE_DIR / f"docs_{max_docs}.jsonl"
+        if cache_file.exists():
+            print(f"Using cached documents from {cache_file}")
+            return cache_file
+        
         print(f"Collecting {max_docs} documents...")
-        docs = []
-        for doc_id, content in get_all_documents(use_wiki=True, use_news=False, max_wiki_docs=max_docs):
-            docs.append((doc_id, content))
-            if len(docs) >= max_docs:
-                break
-        print(f"Collected {len(docs)} documents")
-        return docs
-    
-    def measure_index_creation(self, index_obj, index_id: str, docs: List):
+        DOCS_CACHE_DIR.mkdir(exist_ok=True)
+        tmp_file = cache_file.with_suffix('.tmp')
+        count = 0
+        from data_loader import get_all_documents
+        docs = get_all_documents(use_wiki=True, use_news=False, max_wiki_docs=max_docs)
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            for doc_id, content in islice(docs, max_docs):
+                f.write(json.dumps([doc_id, content]) + '\n')
+                count += 1
+        tmp_file.replace(cache_file)
+        print(f"Collected {count} documents")
+        return cache_file
+    
+    def iter_documents(self, max_docs: int = 1000) -> Iterator[Tuple[str, str]]:
+        """Stream (doc_id, content) tuples from the on-disk document cache."""
+        cache_file = self.collect_documents(max_docs)
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                doc_id, content = json.loads(line)
+                yield doc_id, content
+    
+    def measure_index_creation(self, index_obj, index_id: str, docs: Iterable[Tuple[str, str]]):
         """Measure index creation time and size."""
         print(f"\n{'='*60}")
         print(f"Testing: {index_obj.identifier_short}")
         print(f"{'='*60}")
         
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
         index_obj.create_index(index_id, docs)
-        creation_time = time.time() - start_time
+        creation_time = (time.perf_counter_ns() - start_ns) / 1e9
         
         # Measure disk size
         disk_size = self._get_index_size(index_obj)
@@ -59,81 +119,218 @@ class Benchmark:
         
         return creation_time, disk_size
     
+    def measure_clone_creation(self, base, config: Dict):
+        """Measure re-encode time and size of an index cloned from a built base index.
+        
+        The time skips reading and tokenizing the documents, so it is reported as
+        clone_time rather than compared with full builds' creation_time.
+        """
+        index_cls = config['class']
+        
+        print(f"\n{'='*60}")
+        print(f"Testing: {config['index_id']} (cloned from {base.identifier_short})")
+        print(f"{'='*60}")
+        
+        start_ns = time.perf_counter_ns()
+        index_obj = index_cls.clone_from(base, config['index_id'], **config['params'])
+        clone_time = (time.perf_counter_ns() - start_ns) / 1e9
+        
+        # Measure disk size
+        disk_size = self._get_index_size(index_obj)
+        
+        print(f"Clone time: {clone_time:.2f}s")
+        print(f"Disk size: {disk_size / (1024*1024):.2f} MB")
+        
+        return index_obj, clone_time, disk_size
+    
     def _get_index_size(self, index_obj) -> int:
         """Get index size on disk in bytes."""
+        if hasattr(index_obj, 'base_dir') and os.path.isdir(index_obj.base_dir):
+            return self._walk_size(os.fspath(index_obj.base_dir))
+        return 0
+    
+    @staticmethod
+    def _walk_size(path: str) -> int:
+        """Sum file sizes under path using scandir's cached stat results."""
         total_size = 0
+        stack = [path]
         
-        if hasattr(index_obj, 'base_dir'):
-            base_dir = Path(index_obj.base_dir)
-            if base_dir.exists():
-                for file in base_dir.rglob('*'):
-                    if file.is_file():
-                        total_size += file.stat().st_size
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        total_size += entry.stat(follow_symlinks=False).st_size
         
         return total_size
     
+    @staticmethod
+    def _is_es_index(index_obj) -> bool:
+        """Identify ES indices by their core without importing the elasticsearch client."""
+        return index_obj.identifier_short.startswith('ESIndex_')
+    
+    def _run_query(self, index_obj, index_id: str, query: str):
+        """Dispatch a single query to the index."""
+        if self._is_es_index(index_obj):
+            return index_obj.query(query, index_id, as_json=False)
+        return index_obj.query(query)
+    
+    def warmup(self, index_obj, index_id: str) -> float:
+        """Run every query untimed so connection setup and JIT compilation are excluded."""
+        start_ns = time.perf_counter_ns()
+        for _ in range(self.warmup_iters):
+            for query in self.queries:
+                try:
+                    self._run_query(index_obj, index_id, query)
+                except Exception:
+                    pass
+        return (time.perf_counter_ns() - start_ns) / 1e9
+    
     def measure_query_performance(self, index_obj, index_id: str):
         """Measure query latency and throughput."""
-        print(f"Running {len(self.queries)} queries...")
+        warmup_time = self.warmup(index_obj, index_id)
+        print(f"Warmup time: {warmup_time:.2f}s")
         
-        latencies = []
+        # Every query runs `repeats` times so tail percentiles rest on enough samples
+        workload = self.queries * self.repeats
         
-        # Start memory tracking
-        tracemalloc.start()
-        start_mem = tracemalloc.get_traced_memory()[0]
+        # Concurrent ES searches wait on the cluster, but in-process SelfIndex queries
+        # would only queue on the GIL and inflate their latencies, so they run one at a time
+        workers = self.max_workers if self._is_es_index(index_obj) else 1
+        print(f"Running {len(self.queries)} queries x {self.repeats} repeats "
+              f"with {workers} workers...")
         
-        start_time = time.time()
-        
-        for query in self.queries:
-            query_start = time.time()
+        def timed_query(query):
+            query_start = time.perf_counter_ns()
             
             try:
-                if isinstance(index_obj, MyElasticsearchIndex):
-                    results = index_obj.query(query, index_id)
-                else:
-                    results = index_obj.query(query)
+                self._run_query(index_obj, index_id, query)
             except Exception as e:
                 print(f"Query failed: {query} - {e}")
-                results = "[]"
             
-            query_time = time.time() - query_start
-            latencies.append(query_time)
+            return time.perf_counter_ns() - query_start
         
-        total_time = time.time() - start_time
+        # Latencies are kept in integer nanoseconds and converted only for reporting
+        latencies = [0] * len(workload)
+        
+        # Start memory tracking (tracemalloc hooks every allocation, so only on request)
+        if self.memprofile:
+            tracemalloc.start()
+            start_mem = tracemalloc.get_traced_memory()[0]
+        else:
+            rss_monitor = RSSMonitor()
+            rss_monitor.start()
+        
+        start_ns = time.perf_counter_ns()
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(timed_query, query): i for i, query in enumerate(workload)}
+            for future in as_completed(futures):
+                latencies[futures[future]] = future.result()
+        
+        total_time = (time.perf_counter_ns() - start_ns) / 1e9
         
         # Memory usage
-        peak_mem = tracemalloc.get_traced_memory()[1]
-        mem_used = (peak_mem - start_mem) / (1024 * 1024)  # MB
-        tracemalloc.stop()
+        if self.memprofile:
+            peak_mem = tracemalloc.get_traced_memory()[1]
+            mem_used = (peak_mem - start_mem) / (1024 * 1024)  # MB
+            tracemalloc.stop()
+        else:
+            mem_used = rss_monitor.stop() / (1024 * 1024)  # MB
         
         # Calculate metrics
-        p95 = np.percentile(latencies, 95)
-        p99 = np.percentile(latencies, 99)
-        avg_latency = np.mean(latencies)
-        throughput = len(self.queries) / total_time
+        import numpy as np
+        latency_arr = np.fromiter(latencies, dtype=np.int64, count=len(latencies)) / 1e9
+        p50, p95, p99, p999 = np.percentile(latency_arr, [50, 95, 99, 99.9])
+        avg_latency = latency_arr.mean()
+        max_latency = latency_arr.max()
+        throughput = len(workload) / total_time
         
         print(f"Average latency: {avg_latency*1000:.2f}ms")
+        print(f"P50 latency: {p50*1000:.2f}ms")
         print(f"P95 latency: {p95*1000:.2f}ms")
         print(f"P99 latency: {p99*1000:.2f}ms")
+        print(f"P99.9 latency: {p999*1000:.2f}ms")
+        print(f"Max latency: {max_latency*1000:.2f}ms")
         print(f"Throughput: {throughput:.2f} queries/sec")
         print(f"Memory used: {mem_used:.2f} MB")
         
         return {
             'avg_latency': avg_latency,
+            'p50_latency': p50,
             'p95_latency': p95,
             'p99_latency': p99,
+            'p999_latency': p999,
+            'max_latency': max_latency,
             'throughput': throughput,
-            'memory_mb': mem_used
+            'memory_mb': mem_used,
+            'warmup_time': warmup_time,
+            'concurrency': workers
+        }
+    
+    def measure_msearch_performance(self, index_obj, index_id: str, batch_size: int = 20):
+        """Measure ES latency and throughput with queries batched through _msearch.
+        
+        Per-query latency comes from the server-side `took` of each response,
+        throughput from the wall time of each batch.
+        """
+        print(f"Running {len(self.queries)} queries via msearch in batches of {batch_size}...")
+        
+        latencies = []
+        total_time = 0.0
+        
+        for i in range(0, len(self.queries), batch_size):
+            batch = self.queries[i:i + batch_size]
+            batch_start = time.perf_counter_ns()
+            
+            try:
+                responses = index_obj.multi_query(batch, index_id)
+            except Exception as e:
+                print(f"msearch batch failed: {e}")
+                responses = []
+            
+            total_time += (time.perf_counter_ns() - batch_start) / 1e9
+            latencies.extend(took for _, took in responses if took is not None)
+        
+        if not latencies:
+            return {}
+        
+        import numpy as np
+        latency_arr = np.fromiter(latencies, dtype=np.float64, count=len(latencies))
+        p50, p95, p99 = np.percentile(latency_arr, [50, 95, 99])
+        throughput = len(self.queries) / total_time if total_time > 0 else 0.0
+        
+        print(f"msearch P95 latency: {p95*1000:.2f}ms")
+        print(f"msearch throughput: {throughput:.2f} queries/sec")
+        
+        return {
+            'msearch_avg_latency': latency_arr.mean(),
+            'msearch_p50_latency': p50,
+            'msearch_p95_latency': p95,
+            'msearch_p99_latency': p99,
+            'msearch_throughput': throughput
         }
     
-    def run_benchmark(self, index_obj, index_id: str, docs: List):
+    def run_benchmark(self, index_obj, index_id: str, docs: Iterable[Tuple[str, str]]):
         """Run complete benchmark for an index."""
         creation_time, disk_size = self.measure_index_creation(index_obj, index_id, docs)
+        return self._benchmark_queries(index_obj, index_id, {'creation_time': creation_time}, disk_size)
+    
+    def _benchmark_queries(self, index_obj, index_id: str, build_times: Dict[str, float], disk_size: int):
+        """Measure queries on a built index and record the result.
+        
+        Args:
+            build_times: {'creation_time': seconds} for full builds, {'clone_time': seconds} for clones
+        """
         query_metrics = self.measure_query_performance(index_obj, index_id)
         
+        if self._is_es_index(index_obj):
+            query_metrics.update(self.measure_msearch_performance(index_obj, index_id))
+        
         result = {
             'identifier': index_obj.identifier_short,
-            'creation_time': creation_time,
+            **build_times,
             'disk_size_mb': disk_size / (1024*1024),
             **query_metrics
         }
@@ -147,12 +344,62 @@ class Benchmark:
             json.dump(self.results, f, indent=2)
         print(f"\nResults saved to {output_file}")
 
-def main():
-    """Run benchmarks on different index configurations."""
+def _probe_es(es_host: str = 'localhost', es_port: int = 9200, timeout: float = 0.5) -> bool:
+    """Check that something is listening on the Elasticsearch port."""
+    try:
+        with socket.create_connection((es_host, es_port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+def build_config_group(configs: List[Dict], max_docs: int, build_workers: int = None) -> Dict[str, Dict]:
+    """Build and save the indexes of configs sharing (core, info, dstore). Top-level so it can run in a worker process.
+    
+    The first config that builds successfully becomes the base; the remaining ones
+    only differ in compression, query processing or optimizations and are cloned from it.
+    Queries are not run here, so builds of other groups never overlap a measurement.
+    
+    Returns:
+        Build times, disk size and saved index path keyed by index_id
+    """
     benchmark = Benchmark()
+    builds = {}
+    base = None
+    
+    for config in configs:
+        try:
+            if base is None:
+                index_obj = config['class'](**config['params'], build_workers=build_workers)
+                creation_time, disk_size = benchmark.measure_index_creation(
+                    index_obj, config['index_id'], benchmark.iter_documents(max_docs))
+                build_times = {'creation_time': creation_time}
+                base = index_obj
+            else:
+                index_obj, clone_time, disk_size = benchmark.measure_clone_creation(base, config)
+                build_times = {'clone_time': clone_time}
+            
+            builds[config['index_id']] = {
+                'build_times': build_times,
+                'disk_size': disk_size,
+                'index_path': os.fspath(index_obj.index_path(config['index_id']))
+            }
+        except Exception as e:
+            print(f"Failed to build {config['index_id']}: {e}")
+            import traceback
+            traceback.print_exc()
+    
+    return builds
+
+def main(concurrency: int = 16, memprofile: bool = False, repeats: int = 20):
+    """Run benchmarks on different index configurations."""
+    from es_index import MyElasticsearchIndex
+    from self_index import MySelfIndex
+    
+    benchmark = Benchmark(max_workers=concurrency, memprofile=memprofile, repeats=repeats)
     
-    # Collect documents
-    docs = benchmark.collect_documents(max_docs=50000)
+    # Collect documents once to disk; each config streams them back
+    max_docs = 50000
+    benchmark.collect_documents(max_docs=max_docs)
     
     # Test configurations
     configs = [
@@ -218,16 +465,67 @@ def main():
         },
     ]
     
-    # Run benchmarks
-    for config in configs:
+    # Skip ES configs up front when no cluster is reachable
+    es_available = _probe_es()
+    if not es_available:
+        print("Elasticsearch not reachable at localhost:9200, skipping ES configurations")
+    
+    # Run ES benchmarks in this process to avoid overloading the cluster with clients
+    es_configs = [c for c in configs if c['class'] is MyElasticsearchIndex and es_available]
+    self_configs = [c for c in configs if c['class'] is not MyElasticsearchIndex]
+    
+    for config in es_configs:
         try:
             index_obj = config['class'](**config['params'])
-            benchmark.run_benchmark(index_obj, config['index_id'], docs)
+            benchmark.run_benchmark(index_obj, config['index_id'], benchmark.iter_documents(max_docs))
         except Exception as e:
             print(f"Failed to benchmark {config['index_id']}: {e}")
             import traceback
             traceback.print_exc()
     
+    # Configs sharing (core, info, dstore) reuse one tokenized build; groups write to
+    # disjoint directories, so they are built in parallel with the CPUs split between them
+    groups = {}
+    for config in self_configs:
+        params = config['params']
+        groups.setdefault((params['core'], params['info'], params['dstore']), []).append(config)
+    
+    if groups:
+        builds = {}
+        max_workers = min(len(groups), os.cpu_count() or 1)
+        build_workers = max(1, (os.cpu_count() or 1) // max_workers)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(build_config_group, group, max_docs, build_workers)
+                for group in groups.values()
+            ]
+            for future in as_completed(futures):
+                try:
+                    builds.update(future.result())
+                except Exception as e:
+                    print(f"Failed to build config group: {e}")
+                    import traceback
+                    traceback.print_exc()
+        
+        # Queries are measured one index at a time, in configuration order, once
+        # every build has finished
+        for config in self_configs:
+            build = builds.get(config['index_id'])
+            if build is None:
+                continue
+            try:
+                index_obj = config['class'](**config['params'])
+                index_obj.load_index(build['index_path'])
+                print(f"\n{'='*60}")
+                print(f"Querying: {config['index_id']} ({index_obj.identifier_short})")
+                print(f"{'='*60}")
+                benchmark._benchmark_queries(index_obj, config['index_id'],
+                                             build['build_times'], build['disk_size'])
+            except Exception as e:
+                print(f"Failed to benchmark {config['index_id']}: {e}")
+                import traceback
+                traceback.print_exc()
+    
     # Save results
     benchmark.save_results()
     
@@ -1,8 +1,62 @@
 import json
 import os
-from typing import Generator, Tuple
+import queue
+import sqlite3
+import threading
+from typing import Generator, Iterable, Tuple
 from datasets import load_dataset
 
+# orjson is optional; fall back to the stdlib parser when it is not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_END = object()
+
+# SQLite file inside the news directory holding the already parsed articles
+_NEWS_CACHE = 'news_cache.sqlite'
+
+def _prefetched(iterable: Iterable, buffer_size: int = 256) -> Generator:
+    """Iterate iterable on a background thread, keeping up to buffer_size items ready.
+    
+    Lets dataset download and decoding overlap with the consumer (index building).
+    """
+    items = queue.Queue(maxsize=buffer_size)
+    stop = threading.Event()
+    
+    def put(item) -> bool:
+        # Give up once the consumer has stopped iterating
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+    
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except Exception as e:
+            put((_END, e))
+            return
+        put((_END, None))
+    
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
 def load_wikipedia(max_docs: int = None) -> Generator[Tuple[str, str], None, None]:
     """
     Load Wikipedia dataset from Hugging Face.
@@ -24,7 +78,7 @@ def load_wikipedia(max_docs: int = None) -> Generator[Tuple[str, str], None, Non
     )
     
     count = 0
-    for doc in dataset:
+    for doc in _prefetched(dataset):
         doc_id = f"wiki_{doc['id']}"
         title = doc.get('title', '')
         text = doc.get('text', '')
@@ -39,20 +93,39 @@ def load_wikipedia(max_docs: int = None) -> Generator[Tuple[str, str], None, Non
     
     print(f"Loaded {count} Wikipedia documents")
 
-def load_news_dataset(news_dir: str = "News_Dataset") -> Generator[Tuple[str, str], None, None]:
-    """
-    Load news dataset from local directory structure.
+def _cached_to_sqlite(docs: Iterable[Tuple[str, str]], cache_path: str) -> Generator[Tuple[str, str], None, None]:
+    """Pass docs through, storing them in a SQLite cache that is kept only if iteration completes."""
+    tmp_path = cache_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
     
-    Args:
-        news_dir: Root directory containing news articles
-        
-    Yields:
-        Tuples of (doc_id, content) where content is title + text
-    """
-    if not os.path.exists(news_dir):
-        print(f"Warning: {news_dir} not found. Skipping news dataset.")
-        return
+    conn = sqlite3.connect(tmp_path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('CREATE TABLE news (doc_id TEXT, content TEXT)')
     
+    completed = False
+    try:
+        batch = []
+        for doc in docs:
+            batch.append(doc)
+            if len(batch) >= 1000:
+                conn.executemany('INSERT INTO news (doc_id, content) VALUES (?, ?)', batch)
+                batch = []
+            yield doc
+        
+        conn.executemany('INSERT INTO news (doc_id, content) VALUES (?, ?)', batch)
+        conn.commit()
+        completed = True
+    finally:
+        conn.close()
+        if completed:
+            os.replace(tmp_path, cache_path)
+        else:
+            os.remove(tmp_path)
+
+def _read_news_files(news_dir: str) -> Generator[Tuple[str, str], None, None]:
+    """Parse the news JSON files under news_dir into (doc_id, content) tuples."""
     print(f"Loading news dataset from {news_dir}...")
     
     count = 0
@@ -62,8 +135,9 @@ def load_news_dataset(news_dir: str = "News_Dataset") -> Generator[Tuple[str, st
                 file_path = os.path.join(root, file)
                 
                 try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        article = json.load(f)
+                    with open(file_path, 'rb') as f:
+                        data = f.read()
+                    article = orjson.loads(data) if orjson is not None else json.loads(data)
                     
                     # Generate unique doc_id
                     doc_id = f"news_{count}"
@@ -83,6 +157,46 @@ def load_news_dataset(news_dir: str = "News_Dataset") -> Generator[Tuple[str, st
     
     print(f"Loaded {count} news documents")
 
+def load_news_dataset(news_dir: str = "News_Dataset", use_cache: bool = True) -> Generator[Tuple[str, str], None, None]:
+    """
+    Load news dataset from local directory structure.
+    
+    The first complete pass over the JSON files also stores the articles in a
+    SQLite cache inside news_dir; later calls read that single file instead of
+    opening every article. Delete the cache file after changing the dataset.
+    
+    Args:
+        news_dir: Root directory containing news articles
+        use_cache: Read from, or build, the SQLite cache
+        
+    Yields:
+        Tuples of (doc_id, content) where content is title + text
+    """
+    if not os.path.exists(news_dir):
+        print(f"Warning: {news_dir} not found. Skipping news dataset.")
+        return
+    
+    cache_path = os.path.join(news_dir, _NEWS_CACHE)
+    if use_cache and os.path.exists(cache_path):
+        print(f"Loading news dataset from cache {cache_path}...")
+        
+        count = 0
+        conn = sqlite3.connect(cache_path)
+        try:
+            for doc_id, content in conn.execute('SELECT doc_id, content FROM news ORDER BY rowid'):
+                yield (doc_id, content)
+                count += 1
+        finally:
+            conn.close()
+        
+        print(f"Loaded {count} news documents")
+        return
+    
+    if use_cache:
+        yield from _cached_to_sqlite(_read_news_files(news_dir), cache_path)
+    else:
+        yield from _read_news_files(news_dir)
+
 def get_all_documents(use_wiki: bool = True, use_news: bool = True, 
                       max_wiki_docs: int = 1000, news_dir: str = "News_Dataset") -> Generator[Tuple[str, str], None, None]:
     """
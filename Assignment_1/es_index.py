@@ -1,48 +1,87 @@
 from elasticsearch import Elasticsearch
-from elasticsearch.helpers import bulk
+from elasticsearch.helpers import bulk, parallel_bulk, scan
+import functools
 import json
-import time
-from typing import Iterable, Tuple
+from typing import Iterable, List, Optional, Tuple
 from index_base import IndexBase
 
+# orjson is optional; it speeds up both the client's response parsing and our result dumps
+try:
+    import orjson
+    from elasticsearch.serializer import OrjsonSerializer
+except ImportError:
+    orjson = None
+    OrjsonSerializer = None
+
+# Shared clients keyed by (host, port, connections per node) so every index reuses
+# one warm connection pool of the size it asked for
+_ES_CLIENTS: dict = {}
+
 class MyElasticsearchIndex(IndexBase):
     """Elasticsearch-based search index."""
     
     def __init__(self, core='ESIndex', info='BOOLEAN', dstore='DB1', 
                  qproc='TERMatat', compr='NONE', optim='Null', 
-                 es_host='localhost', es_port=9200):
+                 es_host='localhost', es_port=9200, enable_cache=False, cache_size=4096,
+                 chunk_size=200, thread_count=4, max_chunk_bytes=10 * 1024 * 1024,
+                 max_connections=32):
+        """
+        Args:
+            enable_cache: Keep an LRU of recent query results (off by default, so
+                benchmarks keep measuring Elasticsearch rather than a dict lookup)
+            max_connections: HTTP connections the client keeps per node; at least the
+                number of concurrent searches (the benchmark runs 16 by default)
+        """
         super().__init__(core, info, dstore, qproc, compr, optim)
         
-        # Connect to Elasticsearch with retry logic
-        max_retries = 3
-        retry_delay = 2
-        
-        for attempt in range(max_retries):
-            try:
-                # Initialize Elasticsearch client
-                self.es = Elasticsearch(
-                    [f'http://{es_host}:{es_port}'],
-                    request_timeout=30,
-                    max_retries=3,
-                    retry_on_timeout=True
-                )
-                
-                # Test connection with info() instead of ping()
-                info = self.es.info()
-                print(f"Connected to Elasticsearch at {es_host}:{es_port}")
-                print(f"Cluster: {info['cluster_name']}, Version: {info['version']['number']}")
-                return
-                
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    print(f"Connection attempt {attempt + 1} failed: {e}")
-                    print(f"Retrying in {retry_delay} seconds...")
-                    time.sleep(retry_delay)
-                else:
-                    raise ConnectionError(
-                        f"Cannot connect to Elasticsearch at {es_host}:{es_port}. "
-                        f"Make sure it's running. Error: {e}"
-                    )
+        # Bulk indexing knobs, sized for Wikipedia-length documents
+        self.chunk_size = chunk_size
+        self.thread_count = thread_count
+        self.max_chunk_bytes = max_chunk_bytes
+        
+        # LRU cache of query results keyed by (index_id, clean_query)
+        self.enable_cache = enable_cache
+        self._cached_search = functools.lru_cache(maxsize=cache_size)(self._search)
+        
+        # Reuse an already connected client for this cluster and pool size
+        pool_size = max(max_connections, thread_count + 2)
+        client_key = (es_host, es_port, pool_size)
+        if client_key in _ES_CLIENTS:
+            self.es = _ES_CLIENTS[client_key]
+            return
+        
+        # Connect to Elasticsearch; callers probe connectivity first, so fail fast
+        try:
+            # Initialize Elasticsearch client
+            client_options = {}
+            if OrjsonSerializer is not None:
+                client_options['serializer'] = OrjsonSerializer()
+            
+            self.es = Elasticsearch(
+                [f'http://{es_host}:{es_port}'],
+                request_timeout=30,
+                max_retries=3,
+                retry_on_timeout=True,
+                http_compress=True,
+                # Concurrent searches and parallel_bulk threads never wait for a connection
+                connections_per_node=pool_size,
+                **client_options
+            )
+            
+            # Test connection with info() instead of ping()
+            info = self.es.info()
+            print(f"Connected to Elasticsearch at {es_host}:{es_port}")
+            print(f"Cluster: {info['cluster_name']}, Version: {info['version']['number']}")
+            
+            # Warm the connection pool with a cheap search before anything is timed
+            self.es.search(index="_all", body={"query": {"match_all": {}}, "size": 0})
+        except Exception as e:
+            raise ConnectionError(
+                f"Cannot connect to Elasticsearch at {es_host}:{es_port}. "
+                f"Make sure it's running. Error: {e}"
+            )
+        
+        _ES_CLIENTS[client_key] = self.es
     
     def create_index(self, index_id: str, files: Iterable[Tuple[str, str]]) -> None:
         """Create Elasticsearch index and index documents."""
@@ -53,6 +92,9 @@ class MyElasticsearchIndex(IndexBase):
             "settings": {
                 "number_of_shards": 1,
                 "number_of_replicas": 0,
+                # Bulk-load mode: no periodic refreshes, async translog fsync every 30s
+                "refresh_interval": "-1",
+                "translog": {"durability": "async", "sync_interval": "30s"},
                 "analysis": {
                     "analyzer": {
                         "english_analyzer": {
@@ -62,6 +104,8 @@ class MyElasticsearchIndex(IndexBase):
                 }
             },
             "mappings": {
+                # Content is only searched, never read back; keep it out of the stored source
+                "_source": {"excludes": ["content"]},
                 "properties": {
                     "doc_id": {"type": "keyword"},
                     "content": {
@@ -78,6 +122,7 @@ class MyElasticsearchIndex(IndexBase):
         
         # Create index
         self.es.indices.create(index=index_id, body=settings)
+        self.clear_cache()
         
         # Prepare documents for bulk indexing
         def generate_docs():
@@ -91,65 +136,129 @@ class MyElasticsearchIndex(IndexBase):
                     }
                 }
         
-        # Bulk index documents
-        success, failed = bulk(self.es, generate_docs(), raise_on_error=False)
+        # Bulk index documents, overlapping serialization with network sends
+        success, failed = 0, 0
+        try:
+            for ok, _ in parallel_bulk(self.es, generate_docs(),
+                                       thread_count=self.thread_count,
+                                       chunk_size=self.chunk_size,
+                                       max_chunk_bytes=self.max_chunk_bytes,
+                                       raise_on_error=False):
+                if ok:
+                    success += 1
+                else:
+                    failed += 1
+        finally:
+            # Leave bulk-load mode even if indexing failed
+            self.es.indices.put_settings(
+                index=index_id,
+                body={"index": {"refresh_interval": "1s", "translog": {"durability": "request"}}}
+            )
         
         # Refresh index to make documents searchable
         self.es.indices.refresh(index=index_id)
         
         print(f"Indexed {success} documents successfully")
         if failed:
-            print(f"Failed to index {len(failed)} documents")
+            print(f"Failed to index {failed} documents")
     
     def load_index(self, serialized_index_dump: str) -> None:
         """Load index - not needed for ES as it's always available."""
         print("Elasticsearch index is always loaded")
     
-    def query(self, query: str, index_id: str = "default_index") -> str:
-        """Execute query against Elasticsearch."""
+    def clear_cache(self) -> None:
+        """Drop all cached query results."""
+        self._cached_search.cache_clear()
+    
+    def query(self, query: str, index_id: str = "default_index", as_json: bool = True):
+        """Execute query against Elasticsearch.
+        
+        Returns:
+            Compact JSON results string, or the list of result dicts when as_json is False
+        """
         # Simple query implementation
         # Remove quotes for ES query
         clean_query = query.replace('"', '')
         
-        # Build ES query
-        es_query = {
+        try:
+            if self.enable_cache:
+                results = self._cached_search(index_id, clean_query)
+            else:
+                results = self._search(index_id, clean_query)
+        
+        except Exception as e:
+            print(f"Query error: {e}")
+            results = []
+        
+        if not as_json:
+            return results
+        if orjson is not None:
+            return orjson.dumps(results).decode()
+        return json.dumps(results, separators=(',', ':'))
+    
+    def _build_query(self, clean_query: str) -> dict:
+        """Build the ES match query body."""
+        return {
             "query": {
                 "match": {
                     "content": clean_query
                 }
             },
-            "size": 100
+            "size": 100,
+            # Hits are identified by _id (the doc_id), so don't ship whole articles back
+            "_source": False
         }
+    
+    def _format_hits(self, response: dict) -> List[dict]:
+        """Format search hits as a list of result dicts."""
+        results = []
+        for hit in response['hits']['hits']:
+            results.append({
+                'doc_id': hit['_id'],
+                'score': hit['_score']
+            })
         
-        try:
-            response = self.es.search(index=index_id, body=es_query)
-            
-            # Format results
-            results = []
-            for hit in response['hits']['hits']:
-                results.append({
-                    'doc_id': hit['_source']['doc_id'],
-                    'score': hit['_score']
-                })
-            
-            return json.dumps(results, indent=2)
+        return results
+    
+    def _search(self, index_id: str, clean_query: str) -> List[dict]:
+        """Run a match query and return the formatted results."""
+        response = self.es.search(index=index_id, body=self._build_query(clean_query))
+        return self._format_hits(response)
+    
+    def multi_query(self, queries: List[str], index_id: str = "default_index") -> List[Tuple[List[dict], Optional[float]]]:
+        """Execute several queries in one _msearch round-trip.
         
-        except Exception as e:
-            print(f"Query error: {e}")
-            return json.dumps([])
+        Returns:
+            List of (results, took_seconds) per query, in input order;
+            took_seconds is None for queries that failed
+        """
+        searches = []
+        for query in queries:
+            searches.append({"index": index_id})
+            searches.append(self._build_query(query.replace('"', '')))
+        
+        response = self.es.msearch(searches=searches)
+        
+        results = []
+        for item in response['responses']:
+            if 'error' in item:
+                results.append(([], None))
+            else:
+                results.append((self._format_hits(item), item['took'] / 1000))
+        return results
     
     def update_index(self, index_id: str, remove_files: Iterable[Tuple[str, str]], 
                     add_files: Iterable[Tuple[str, str]]) -> None:
         """Update Elasticsearch index."""
-        # Remove documents
-        for doc_id, _ in remove_files:
-            try:
-                self.es.delete(index=index_id, id=doc_id)
-            except:
-                pass
-        
-        # Add documents
+        # Removals and additions go through a single bulk request stream
         def generate_docs():
+            for doc_id, _ in remove_files:
+                yield {
+                    "_op_type": "delete",
+                    "_index": index_id,
+                    "_id": doc_id
+                }
+            
             for doc_id, content in add_files:
                 yield {
                     "_index": index_id,
@@ -160,13 +269,15 @@ class MyElasticsearchIndex(IndexBase):
                     }
                 }
         
-        bulk(self.es, generate_docs(), raise_on_error=False)
+        bulk(self.es, generate_docs(), raise_on_error=False, chunk_size=500)
         self.es.indices.refresh(index=index_id)
+        self.clear_cache()
     
     def delete_index(self, index_id: str) -> None:
         """Delete Elasticsearch index."""
         if self.es.indices.exists(index=index_id):
             self.es.indices.delete(index=index_id)
+            self.clear_cache()
             print(f"Deleted index: {index_id}")
     
     def list_indices(self) -> Iterable[str]:
@@ -177,15 +288,17 @@ class MyElasticsearchIndex(IndexBase):
     def list_indexed_files(self, index_id: str) -> Iterable[str]:
         """List all document IDs in index."""
         try:
-            response = self.es.search(
+            # Page through every hit instead of capping at a single 10k-hit response
+            hits = scan(
+                self.es,
                 index=index_id,
-                body={
+                query={
                     "query": {"match_all": {}},
-                    "_source": ["doc_id"],
-                    "size": 10000
-                }
+                    "_source": ["doc_id"]
+                },
+                size=1000
             )
             
-            return [hit['_source']['doc_id'] for hit in response['hits']['hits']]
+            return [hit['_source']['doc_id'] for hit in hits]
         except:
             return []
\ No newline at end of file
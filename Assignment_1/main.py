@@ -25,24 +25,24 @@ def generate_preprocessing_plots():
     generate_word_frequency_plots(docs, output_prefix='word_freq')
     print("Word frequency plots generated successfully")
 
-def run_benchmarks():
+def run_benchmarks(concurrency: int = 16, memprofile: bool = False, repeats: int = 20):
     """Run all benchmarks."""
     print("\n" + "="*60)
     print("STEP 2: Running Benchmarks")
     print("="*60)
     
     from benchmark import main as benchmark_main
-    benchmark_main()
+    benchmark_main(concurrency=concurrency, memprofile=memprofile, repeats=repeats)
 
-def generate_plots():
-    """Generate all comparison plots."""
+def generate_plots(as_pdf=False, force=False):
+    """Generate all comparison plots (only when stale, unless force is set)."""
     print("\n" + "="*60)
     print("STEP 3: Generating Comparison Plots")
     print("="*60)
     
     from plot_generator import PlotGenerator
     plotter = PlotGenerator()
-    plotter.generate_all_plots()
+    plotter.generate_all_plots(as_pdf=as_pdf, force=force)
 
 def create_sample_queries():
     """Create sample query file if it doesn't exist."""
@@ -88,6 +88,33 @@ def main():
         action='store_true',
         help='Skip Elasticsearch benchmarks'
     )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=16,
+        help='Worker threads issuing Elasticsearch benchmark queries; SelfIndex queries run one at a time (default: 16)'
+    )
+    parser.add_argument(
+        '--memprofile',
+        action='store_true',
+        help='Measure query memory with tracemalloc instead of RSS sampling (slower)'
+    )
+    parser.add_argument(
+        '--repeats',
+        type=int,
+        default=20,
+        help='Times each benchmark query is repeated for latency percentiles (default: 20)'
+    )
+    parser.add_argument(
+        '--pdf',
+        action='store_true',
+        help='Write all comparison plots into a single plots/all_plots.pdf'
+    )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Regenerate plots even if they are newer than the benchmark results'
+    )
     
     args = parser.parse_args()
     
@@ -104,7 +131,8 @@ def main():
     
     if args.step in ['all', 'benchmark']:
         try:
-            run_benchmarks()
+            run_benchmarks(concurrency=args.concurrency, memprofile=args.memprofile,
+                           repeats=args.repeats)
         except Exception as e:
             print(f"Error in benchmarking: {e}")
             import traceback
@@ -112,7 +140,7 @@ def main():
     
     if args.step in ['all', 'plots']:
         try:
-            generate_plots()
+            generate_plots(as_pdf=args.pdf, force=args.force)
         except Exception as e:
             print(f"Error generating plots: {e}")
     
@@ -1,353 +1,264 @@
 """Check if plots are consistent with benchmark.json and regenerate if needed."""
 
+import argparse
 import json
-import matplotlib.pyplot as plt
+import os
+import pickle
+import re
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+matplotlib.use('Agg')  # headless rendering; no GUI backend discovery
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.collections import PolyCollection
+from matplotlib.colors import to_rgba
 import numpy as np
 from pathlib import Path
 
-def load_benchmark_data():
+# orjson is optional; fall back to the stdlib parser when it is not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# numba is optional; fall back to plain Python when it is not installed
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# Identifier format: {core}_i{x}d{y}c{z}q{w}o{opt}, e.g. SelfIndex_i3d2c1qTo0
+IDENTIFIER_RE = re.compile(r'_i(?P<i>\d)d(?P<d>\d)c(?P<c>\d)q(?P<q>[TD])o(?P<o>.*)$')
+
+# PNG export settings: 150 dpi is plenty for the dashboards and zlib level 1
+# encodes several times faster than the default level 6
+SAVE_KW = dict(dpi=150, pil_kwargs={'compress_level': 1})
+SUMMARY_SAVE_KW = dict(SAVE_KW, dpi=200)
+
+# Shared palette, resolved to RGBA once instead of per bar/point
+_PALETTE = tuple(to_rgba(c) for c in ('steelblue', 'coral', 'seagreen', 'mediumpurple', 'red'))
+STEELBLUE, CORAL, SEAGREEN, PURPLE, RED = _PALETTE
+
+def parse_identifier(identifier):
+    """Split an index identifier into its config codes, or None if it does not match."""
+    match = IDENTIFIER_RE.search(identifier)
+    return match.groupdict() if match else None
+
+def _short_identifier(identifier):
+    """Compact label: drop the SelfIndex_ prefix and shorten ESIndex_ to ES_."""
+    if identifier.startswith('SelfIndex_'):
+        return identifier.removeprefix('SelfIndex_')
+    if identifier.startswith('ESIndex_'):
+        return 'ES_' + identifier.removeprefix('ESIndex_')
+    return identifier
+
+def load_benchmark_data(results_file='benchmark_results.json'):
     """Load benchmark results."""
-    with open('benchmark_results.json', 'r') as f:
+    if orjson is not None:
+        return orjson.loads(Path(results_file).read_bytes())
+    with open(results_file, 'r') as f:
         return json.load(f)
 
-def check_and_plot():
-    """Check plots against benchmark data and regenerate if needed."""
-    
-    print("Loading benchmark data...")
-    data = load_benchmark_data()
-    
-    print(f"Found {len(data)} benchmark configurations\n")
-    
-    # Organize data by categories
-    by_datastore = {}
-    by_compression = {}
-    by_index_type = {}
-    by_query_proc = {}
-    by_optimization = {}
+def load_parsed_results(results_file='benchmark_results.json'):
+    """Load benchmark results together with their parsed identifiers.
+    
+    The parsed form is pickled next to the JSON and reused while it is at
+    least as new as the JSON, so re-running the plots skips both parses.
+    
+    Returns:
+        (list of result dicts, parse_identifier() output for each result)
+    """
+    src = Path(results_file)
+    cache = src.with_suffix('.cache.pkl')
+    
+    if cache.exists() and cache.stat().st_mtime >= src.stat().st_mtime:
+        try:
+            with open(cache, 'rb') as f:
+                return pickle.load(f)
+        except (pickle.UnpicklingError, EOFError):
+            pass  # Unreadable cache, rebuild it below
+    
+    data = load_benchmark_data(src)
+    parsed = (data, [parse_identifier(c['identifier']) for c in data])
+    
+    tmp = cache.with_suffix('.tmp')
+    with open(tmp, 'wb') as f:
+        pickle.dump(parsed, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, cache)
+    
+    return parsed
+
+METRICS = ('creation_time', 'clone_time', 'avg_latency', 'disk_size_mb', 'throughput',
+           'memory_mb', 'p95_latency', 'p99_latency')
+
+@njit(cache=True)
+def _group_sums(group_ids, metrics, n_groups):
+    """Per-group sums and non-NaN counts of every metric column."""
+    n_rows, n_cols = metrics.shape
+    sums = np.zeros((n_groups, n_cols))
+    counts = np.zeros((n_groups, n_cols))
+    for j in range(n_cols):
+        for i in range(n_rows):
+            value = metrics[i, j]
+            if not np.isnan(value):
+                sums[group_ids[i], j] += value
+                counts[group_ids[i], j] += 1
+    return sums, counts
+
+def group_means(labels, metrics):
+    """Average every metric column per group label in one vectorized pass.
     
-    for config in data:
-        name = config['identifier']  # Changed from 'name' to 'identifier'
-        
-        # Extract configuration from name (format: SelfIndex_i{x}d{y}c{z}q{w}o{opt})
-        parts = name.split('_')
-        if len(parts) < 2:
-            continue
-            
-        config_str = parts[1]  # e.g., "i3d2c1qTo0"
-        
-        # Parse configuration
-        idx_type = config_str[1] if len(config_str) > 1 else '?'
-        datastore = config_str[3] if len(config_str) > 3 else '?'
-        compression = config_str[5] if len(config_str) > 5 else '?'
-        query_proc = config_str[7] if len(config_str) > 7 else '?'
-        optimization = config_str[9:] if len(config_str) > 9 else '0'
-        
-        # Group by datastore (y)
-        datastore_name = {'1': 'Custom/Pickle', '2': 'SQLite', '3': 'PostgreSQL'}.get(datastore, f'DS_{datastore}')
-        if datastore_name not in by_datastore:
-            by_datastore[datastore_name] = []
-        by_datastore[datastore_name].append(config)
-        
-        # Group by compression (z)
-        comp_name = {'1': 'None', '2': 'VByte', '3': 'zlib'}.get(compression, f'Comp_{compression}')
-        if comp_name not in by_compression:
-            by_compression[comp_name] = []
-        by_compression[comp_name].append(config)
+    Args:
+        labels: Group label for each row of metrics
+        metrics: (n_configs, len(METRICS)) array, NaN where a metric is missing
         
-        # Group by index type (x)
-        idx_name = {'1': 'Boolean', '2': 'WordCount', '3': 'TF-IDF'}.get(idx_type, f'Idx_{idx_type}')
-        if idx_name not in by_index_type:
-            by_index_type[idx_name] = []
-        by_index_type[idx_name].append(config)
-        
-        # Group by query processing (q)
-        qproc_name = {'T': 'TAAT', 'D': 'DAAT'}.get(query_proc, f'QP_{query_proc}')
-        if qproc_name not in by_query_proc:
-            by_query_proc[qproc_name] = []
-        by_query_proc[qproc_name].append(config)
-        
-        # Group by optimization (o)
-        opt_name = {'0': 'None', 'sp': 'Skip Pointers', 'th': 'Threshold', 'es': 'Early Stop'}.get(optimization, optimization)
-        if opt_name not in by_optimization:
-            by_optimization[opt_name] = []
-        by_optimization[opt_name].append(config)
-    
-    # Print summary
-    print("Configuration breakdown:")
-    print(f"  Datastores: {list(by_datastore.keys())}")
-    print(f"  Compressions: {list(by_compression.keys())}")
-    print(f"  Index types: {list(by_index_type.keys())}")
-    print(f"  Query processing: {list(by_query_proc.keys())}")
-    print(f"  Optimizations: {list(by_optimization.keys())}")
-    print()
-    
-    # Calculate averages
-    def calc_avg(configs_list, key):
-        if not configs_list:
-            return 0
-        values = [c[key] for c in configs_list if key in c]
-        return sum(values) / len(values) if values else 0
-    
-    # Generate plots
-    plots_dir = Path('plots')
-    plots_dir.mkdir(exist_ok=True)
-    
-    # 1. Datastore comparison (y)
-    print("Generating datastore comparison plot...")
-    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
-    fig.suptitle('Datastore Comparison (y parameter)', fontsize=16, fontweight='bold')
-    
-    datastores = list(by_datastore.keys())
-    
-    # Index time
-    ax = axes[0, 0]
-    index_times = [calc_avg(by_datastore[ds], 'creation_time') for ds in datastores]
-    ax.bar(datastores, index_times, color='steelblue')
-    ax.set_ylabel('Time (seconds)')
-    ax.set_title('Index Creation Time')
-    ax.grid(axis='y', alpha=0.3)
-    
-    # Query time
-    ax = axes[0, 1]
-    query_times = [calc_avg(by_datastore[ds], 'avg_latency') for ds in datastores]
-    ax.bar(datastores, query_times, color='coral')
-    ax.set_ylabel('Time (seconds)')
-    ax.set_title('Average Query Latency')
-    ax.grid(axis='y', alpha=0.3)
-    
-    # Index size
-    ax = axes[1, 0]
-    index_sizes = [calc_avg(by_datastore[ds], 'disk_size_mb') for ds in datastores]
-    ax.bar(datastores, index_sizes, color='seagreen')
-    ax.set_ylabel('Size (MB)')
-    ax.set_title('Index Size')
-    ax.grid(axis='y', alpha=0.3)
-    
-    # Throughput
-    ax = axes[1, 1]
-    throughputs = [calc_avg(by_datastore[ds], 'throughput') for ds in datastores]
-    ax.bar(datastores, throughputs, color='mediumpurple')
-    ax.set_ylabel('Queries/sec')
-    ax.set_title('Query Throughput')
-    ax.grid(axis='y', alpha=0.3)
-    
-    plt.tight_layout()
-    plt.savefig(plots_dir / 'plot_a_datastores.png', dpi=300, bbox_inches='tight')
-    print(f"  Saved: plot_a_datastores.png")
-    plt.close()
-    
-    # 2. Compression comparison (z)
-    print("Generating compression comparison plot...")
-    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
-    fig.suptitle('Compression Strategy Comparison (z parameter)', fontsize=16, fontweight='bold')
-    
-    compressions = list(by_compression.keys())
-    
-    # Index time
-    ax = axes[0, 0]
-    index_times = [calc_avg(by_compression[c], 'creation_time') for c in compressions]
-    ax.bar(compressions, index_times, color='steelblue')
-    ax.set_ylabel('Time (seconds)')
-    ax.set_title('Index Creation Time')
-    ax.grid(axis='y', alpha=0.3)
-    
-    # Query time
-    ax = axes[0, 1]
-    query_times = [calc_avg(by_compression[c], 'avg_latency') for c in compressions]
-    ax.bar(compressions, query_times, color='coral')
-    ax.set_ylabel('Time (seconds)')
-    ax.set_title('Average Query Latency')
-    ax.grid(axis='y', alpha=0.3)
-    
-    # Index size
-    ax = axes[1, 0]
-    index_sizes = [calc_avg(by_compression[c], 'disk_size_mb') for c in compressions]
-    ax.bar(compressions, index_sizes, color='seagreen')
-    ax.set_ylabel('Size (MB)')
-    ax.set_title('Index Size')
-    ax.grid(axis='y', alpha=0.3)
-    
-    # Compression ratio
-    ax = axes[1, 1]
-    if compressions:
-        baseline_size = calc_avg(by_compression[compressions[0]], 'disk_size_mb')
-        ratios = [baseline_size / calc_avg(by_compression[c], 'disk_size_mb') if calc_avg(by_compression[c], 'disk_size_mb') > 0 else 0 for c in compressions]
-        ax.bar(compressions, ratios, color='mediumpurple')
-        ax.set_ylabel('Compression Ratio')
-        ax.set_title('Compression Ratio (vs baseline)')
-        ax.axhline(y=1, color='red', linestyle='--', alpha=0.5)
-        ax.grid(axis='y', alpha=0.3)
-    
-    plt.tight_layout()
-    plt.savefig(plots_dir / 'plot_ab_compression.png', dpi=300, bbox_inches='tight')
-    print(f"  Saved: plot_ab_compression.png")
-    plt.close()
-    
-    # 3. Index type comparison (x)
-    print("Generating index type comparison plot...")
-    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
-    fig.suptitle('Index Type Comparison (x parameter)', fontsize=16, fontweight='bold')
-    
-    index_types = list(by_index_type.keys())
-    
-    # Index time
-    ax = axes[0, 0]
-    index_times = [calc_avg(by_index_type[it], 'creation_time') for it in index_types]
-    ax.bar(index_types, index_times, color='steelblue')
-    ax.set_ylabel('Time (seconds)')
-    ax.set_title('Index Creation Time')
-    ax.grid(axis='y', alpha=0.3)
-    
-    # Query time
-    ax = axes[0, 1]
-    query_times = [calc_avg(by_index_type[it], 'avg_latency') for it in index_types]
-    ax.bar(index_types, query_times, color='coral')
-    ax.set_ylabel('Time (seconds)')
-    ax.set_title('Average Query Latency')
-    ax.grid(axis='y', alpha=0.3)
-    
-    # Throughput
-    ax = axes[1, 0]
-    throughputs = [calc_avg(by_index_type[it], 'throughput') for it in index_types]
-    ax.bar(index_types, throughputs, color='seagreen')
-    ax.set_ylabel('Queries/sec')
-    ax.set_title('Query Throughput')
-    ax.grid(axis='y', alpha=0.3)
-    
-    # Memory usage
-    ax = axes[1, 1]
-    memory = [calc_avg(by_index_type[it], 'memory_mb') for it in index_types]
-    ax.bar(index_types, memory, color='mediumpurple')
-    ax.set_ylabel('Memory (MB)')
-    ax.set_title('Memory Usage')
+    Returns:
+        (group labels in first-seen order, {metric: array of group means})
+    """
+    if not labels:
+        return [], {key: np.zeros(0) for key in METRICS}
+    
+    uniq, first_idx, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    sums, counts = _group_sums(inverse.astype(np.int64).ravel(),
+                               np.ascontiguousarray(metrics, dtype=np.float64), len(uniq))
+    # Groups without a metric (e.g. clones have clone_time, not creation_time) stay NaN and draw no bar
+    means = np.divide(sums, counts, out=np.full_like(sums, np.nan), where=counts > 0)
+    
+    # Keep groups in the order they first appear, like the plots always have
+    order = np.argsort(first_idx)
+    return [str(u) for u in uniq[order]], {key: means[order, i] for i, key in enumerate(METRICS)}
+
+# Comparison figures: (file, title, dimension, bar panels, x tick rotation).
+# Each panel is (metric, title, y label, color); metrics in DERIVED are
+# ratios of the first group's value over each group's value, and a tuple
+# of metrics draws one bar per metric side by side.
+FIGURES = (
+    ('plot_a_datastores.png', 'Datastore Comparison (y parameter)', 'datastore', (
+        ('creation_time', 'Index Creation Time', 'Time (seconds)', STEELBLUE),
+        ('avg_latency', 'Average Query Latency', 'Time (seconds)', CORAL),
+        ('disk_size_mb', 'Index Size', 'Size (MB)', SEAGREEN),
+        ('throughput', 'Query Throughput', 'Queries/sec', PURPLE),
+    ), 0),
+    ('plot_ab_compression.png', 'Compression Strategy Comparison (z parameter)', 'compression', (
+        (('creation_time', 'clone_time'), 'Index Build Time', 'Time (seconds)', STEELBLUE),
+        ('avg_latency', 'Average Query Latency', 'Time (seconds)', CORAL),
+        ('disk_size_mb', 'Index Size', 'Size (MB)', SEAGREEN),
+        ('compression_ratio', 'Compression Ratio (vs baseline)', 'Compression Ratio', PURPLE),
+    ), 0),
+    ('plot_c_index_types.png', 'Index Type Comparison (x parameter)', 'index_type', (
+        ('creation_time', 'Index Creation Time', 'Time (seconds)', STEELBLUE),
+        ('avg_latency', 'Average Query Latency', 'Time (seconds)', CORAL),
+        ('throughput', 'Query Throughput', 'Queries/sec', SEAGREEN),
+        ('memory_mb', 'Memory Usage', 'Memory (MB)', PURPLE),
+    ), 0),
+    ('plot_ac_query_processing.png', 'Query Processing Strategy Comparison (q parameter)', 'query_proc', (
+        ('avg_latency', 'Average Query Latency', 'Time (seconds)', CORAL),
+        ('p95_latency', 'P95 Latency', 'Time (seconds)', SEAGREEN),
+        ('p99_latency', 'P99 Latency', 'Time (seconds)', PURPLE),
+        ('throughput', 'Query Throughput', 'Queries/sec', STEELBLUE),
+    ), 0),
+    ('plot_a_optimization.png', 'Optimization Strategy Comparison (o parameter)', 'optimization', (
+        ('avg_latency', 'Average Query Latency', 'Time (seconds)', CORAL),
+        ('throughput', 'Query Throughput', 'Queries/sec', SEAGREEN),
+        ('disk_size_mb', 'Index Size', 'Size (MB)', PURPLE),
+        ('speedup', 'Query Speedup (vs baseline)', 'Speedup Factor', STEELBLUE),
+    ), 45),
+)
+
+DERIVED = {'compression_ratio': 'disk_size_mb', 'speedup': 'avg_latency'}
+
+# Legend entries of metrics drawn side by side in one panel
+SERIES_LABELS = {'creation_time': 'Full build', 'clone_time': 'Re-encoded from a built index'}
+
+def _panel_values(metric, means):
+    """Bar heights for one panel; derived metrics are baseline / value per group.
+    
+    A tuple of metrics gives a list of (legend label, heights) series, leaving
+    out metrics no group has.
+    """
+    if isinstance(metric, tuple):
+        return [(SERIES_LABELS[m], means[m]) for m in metric if not np.isnan(means[m]).all()]
+    if metric not in DERIVED:
+        return means[metric]
+    values = means[DERIVED[metric]]
+    baseline = values[0]  # first group seen is the reference
+    return np.divide(baseline, values, out=np.zeros_like(values), where=values > 0)
+
+def _bar_panel(ax, labels, values, title, ylabel, color, baseline=False, rotation=0):
+    """Draw one bar subplot of a comparison figure."""
+    if isinstance(values, list):
+        # Side-by-side series; groups missing a metric (NaN) simply have no bar there
+        x = np.arange(len(labels))
+        width = 0.8 / max(len(values), 1)
+        for k, (series, heights) in enumerate(values):
+            ax.bar(x + (k - (len(values) - 1) / 2) * width, heights, width,
+                   color=color, alpha=1 - 0.45 * k, label=series)
+        ax.set_xticks(x, labels)
+        ax.legend()
+    else:
+        ax.bar(labels, values, color=color)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    if baseline:
+        ax.axhline(y=1, color=RED, linestyle='--', alpha=0.5)
     ax.grid(axis='y', alpha=0.3)
-    
-    plt.tight_layout()
-    plt.savefig(plots_dir / 'plot_c_index_types.png', dpi=300, bbox_inches='tight')
-    print(f"  Saved: plot_c_index_types.png")
-    plt.close()
-    
-    # 4. Query processing comparison (q)
-    print("Generating query processing comparison plot...")
-    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
-    fig.suptitle('Query Processing Strategy Comparison (q parameter)', fontsize=16, fontweight='bold')
-    
-    query_procs = list(by_query_proc.keys())
-    
-    if len(query_procs) > 0:
-        # Query time
-        ax = axes[0, 0]
-        query_times = [calc_avg(by_query_proc[qp], 'avg_latency') for qp in query_procs]
-        ax.bar(query_procs, query_times, color='coral')
-        ax.set_ylabel('Time (seconds)')
-        ax.set_title('Average Query Latency')
-        ax.grid(axis='y', alpha=0.3)
-        
-        # P95 latency
-        ax = axes[0, 1]
-        p95_latencies = [calc_avg(by_query_proc[qp], 'p95_latency') for qp in query_procs]
-        ax.bar(query_procs, p95_latencies, color='seagreen')
-        ax.set_ylabel('Time (seconds)')
-        ax.set_title('P95 Latency')
-        ax.grid(axis='y', alpha=0.3)
-        
-        # P99 latency
-        ax = axes[1, 0]
-        p99_latencies = [calc_avg(by_query_proc[qp], 'p99_latency') for qp in query_procs]
-        ax.bar(query_procs, p99_latencies, color='mediumpurple')
-        ax.set_ylabel('Time (seconds)')
-        ax.set_title('P99 Latency')
-        ax.grid(axis='y', alpha=0.3)
-        
-        # Throughput
-        ax = axes[1, 1]
-        throughputs = [calc_avg(by_query_proc[qp], 'throughput') for qp in query_procs]
-        ax.bar(query_procs, throughputs, color='steelblue')
-        ax.set_ylabel('Queries/sec')
-        ax.set_title('Query Throughput')
-        ax.grid(axis='y', alpha=0.3)
-    
-    plt.tight_layout()
-    plt.savefig(plots_dir / 'plot_ac_query_processing.png', dpi=300, bbox_inches='tight')
-    print(f"  Saved: plot_ac_query_processing.png")
-    plt.close()
-    
-    # 5. Optimization comparison (o)
-    print("Generating optimization comparison plot...")
-    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
-    fig.suptitle('Optimization Strategy Comparison (o parameter)', fontsize=16, fontweight='bold')
-    
-    optimizations = list(by_optimization.keys())
-    
-    if len(optimizations) > 0:
-        # Query time
-        ax = axes[0, 0]
-        query_times = [calc_avg(by_optimization[opt], 'avg_latency') for opt in optimizations]
-        ax.bar(optimizations, query_times, color='coral')
-        ax.set_ylabel('Time (seconds)')
-        ax.set_title('Average Query Latency')
-        ax.grid(axis='y', alpha=0.3)
-        for label in ax.get_xticklabels():
-            label.set_rotation(45)
-            label.set_ha('right')
-        
-        # Throughput
-        ax = axes[0, 1]
-        throughputs = [calc_avg(by_optimization[opt], 'throughput') for opt in optimizations]
-        ax.bar(optimizations, throughputs, color='seagreen')
-        ax.set_ylabel('Queries/sec')
-        ax.set_title('Query Throughput')
-        ax.grid(axis='y', alpha=0.3)
-        for label in ax.get_xticklabels():
-            label.set_rotation(45)
-            label.set_ha('right')
-        
-        # Index size
-        ax = axes[1, 0]
-        index_sizes = [calc_avg(by_optimization[opt], 'disk_size_mb') for opt in optimizations]
-        ax.bar(optimizations, index_sizes, color='mediumpurple')
-        ax.set_ylabel('Size (MB)')
-        ax.set_title('Index Size')
-        ax.grid(axis='y', alpha=0.3)
-        for label in ax.get_xticklabels():
-            label.set_rotation(45)
-            label.set_ha('right')
-        
-        # Speedup
-        ax = axes[1, 1]
-        if optimizations:
-            baseline_time = calc_avg(by_optimization[optimizations[0]], 'avg_latency')
-            speedups = [baseline_time / calc_avg(by_optimization[opt], 'avg_latency') if calc_avg(by_optimization[opt], 'avg_latency') > 0 else 0 for opt in optimizations]
-            ax.bar(optimizations, speedups, color='steelblue')
-            ax.set_ylabel('Speedup Factor')
-            ax.set_title('Query Speedup (vs baseline)')
-            ax.axhline(y=1, color='red', linestyle='--', alpha=0.5)
-            ax.grid(axis='y', alpha=0.3)
-            for label in ax.get_xticklabels():
-                label.set_rotation(45)
-                label.set_ha('right')
-    
-    plt.tight_layout()
-    plt.savefig(plots_dir / 'plot_a_optimization.png', dpi=300, bbox_inches='tight')
-    print(f"  Saved: plot_a_optimization.png")
-    plt.close()
-    
-    # 6. Overall comparison summary
-    print("Generating comparison summary plot...")
-    fig = plt.figure(figsize=(16, 10))
-    gs = fig.add_gridspec(3, 3, hspace=0.3, wspace=0.3)
+    if rotation:
+        ax.set_xticks(range(len(labels)), labels, rotation=rotation, ha='right')
+
+def _comparison_figure(title, labels, panels, rotation):
+    """Build a 2x2 comparison figure of bar panels."""
+    fig = Figure(figsize=(14, 10), layout='constrained')
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(2, 2)
+    fig.suptitle(title, fontsize=16, fontweight='bold')
+    
+    if labels:
+        for ax, panel in zip(axes.flat, panels):
+            _bar_panel(ax, labels, *panel, rotation=rotation)
+    
+    return fig
+
+def _rect_collection(x0, x1, y0, y1, **kwargs):
+    """All rectangles [x0, x1] x [y0, y1] as one PolyCollection artist."""
+    x0, x1, y0, y1 = np.broadcast_arrays(x0, x1, y0, y1)
+    verts = np.stack([np.stack([x0, y0], -1), np.stack([x1, y0], -1),
+                      np.stack([x1, y1], -1), np.stack([x0, y1], -1)], axis=1)
+    return PolyCollection(verts, **kwargs)
+
+def _hist_bars(ax, values, color, bins=15):
+    """Histogram drawn as a single collection from np.histogram counts."""
+    counts, edges = np.histogram(values, bins=bins)
+    ax.add_collection(_rect_collection(edges[:-1], edges[1:], 0, counts, facecolors=color,
+                                       edgecolors='black', alpha=0.7))
+    ax.autoscale_view()
+    ax.set_ylim(bottom=0)
+
+def _summary_figure(names, top_times, times, sizes, throughputs, memory, is_es):
+    """Build the overall summary figure.
+    
+    Args:
+        names: Short labels of the fastest configs, fastest first
+        top_times: Query latency of each of those configs
+        times, sizes, throughputs, memory: Per-config metric arrays
+        is_es: Boolean mask of Elasticsearch configs
+    """
+    fig = Figure(figsize=(16, 10), layout='constrained')
+    FigureCanvasAgg(fig)
+    gs = fig.add_gridspec(3, 3)
     fig.suptitle('Benchmark Results Summary', fontsize=18, fontweight='bold')
     
-    # Top metrics by configuration
-    all_configs = data.copy()
-    all_configs.sort(key=lambda x: x['avg_latency'])
-    
     # Best query time
     ax = fig.add_subplot(gs[0, :])
-    top_n = min(10, len(all_configs))
-    names = [c['identifier'].replace('SelfIndex_', '').replace('ESIndex_', 'ES_') for c in all_configs[:top_n]]
-    times = [c['avg_latency'] for c in all_configs[:top_n]]
-    ax.barh(names, times, color='coral')
+    top_n = len(names)
+    positions = np.arange(top_n)
+    ax.add_collection(_rect_collection(0, top_times, positions - 0.4, positions + 0.4, facecolors=CORAL))
+    ax.set_yticks(positions, names)
+    ax.set_ylim(-0.5, top_n - 0.5)
+    ax.set_xlim(0, (top_times.max() if top_n else 1) * 1.05)
     ax.set_xlabel('Query Latency (seconds)')
     ax.set_title(f'Top {top_n} Configurations by Query Speed', fontweight='bold')
     ax.invert_yaxis()
@@ -355,8 +266,7 @@ def check_and_plot():
     
     # Index size distribution
     ax = fig.add_subplot(gs[1, 0])
-    sizes = [c['disk_size_mb'] for c in all_configs]
-    ax.hist(sizes, bins=15, color='seagreen', edgecolor='black', alpha=0.7)
+    _hist_bars(ax, sizes, SEAGREEN)
     ax.set_xlabel('Index Size (MB)')
     ax.set_ylabel('Frequency')
     ax.set_title('Index Size Distribution')
@@ -364,8 +274,7 @@ def check_and_plot():
     
     # Query time distribution
     ax = fig.add_subplot(gs[1, 1])
-    times = [c['avg_latency'] for c in all_configs]
-    ax.hist(times, bins=15, color='coral', edgecolor='black', alpha=0.7)
+    _hist_bars(ax, times, CORAL)
     ax.set_xlabel('Query Latency (seconds)')
     ax.set_ylabel('Frequency')
     ax.set_title('Query Latency Distribution')
@@ -373,8 +282,7 @@ def check_and_plot():
     
     # Throughput distribution
     ax = fig.add_subplot(gs[1, 2])
-    throughputs = [c['throughput'] for c in all_configs]
-    ax.hist(throughputs, bins=15, color='mediumpurple', edgecolor='black', alpha=0.7)
+    _hist_bars(ax, throughputs, PURPLE)
     ax.set_xlabel('Throughput (queries/sec)')
     ax.set_ylabel('Frequency')
     ax.set_title('Throughput Distribution')
@@ -382,10 +290,7 @@ def check_and_plot():
     
     # Trade-off: Query time vs Index size
     ax = fig.add_subplot(gs[2, 0])
-    times = [c['avg_latency'] for c in all_configs]
-    sizes = [c['disk_size_mb'] for c in all_configs]
-    colors = ['red' if 'ES' in c['identifier'] else 'steelblue' for c in all_configs]
-    ax.scatter(times, sizes, alpha=0.6, s=50, c=colors)
+    ax.scatter(times, sizes, alpha=0.6, s=50, c=np.where(is_es[:, None], RED, STEELBLUE))
     ax.set_xlabel('Query Latency (seconds)')
     ax.set_ylabel('Index Size (MB)')
     ax.set_title('Query Latency vs Index Size')
@@ -393,10 +298,7 @@ def check_and_plot():
     
     # Trade-off: Query time vs Throughput
     ax = fig.add_subplot(gs[2, 1])
-    times = [c['avg_latency'] for c in all_configs]
-    throughputs = [c['throughput'] for c in all_configs]
-    colors = ['red' if 'ES' in c['identifier'] else 'coral' for c in all_configs]
-    ax.scatter(times, throughputs, alpha=0.6, s=50, c=colors)
+    ax.scatter(times, throughputs, alpha=0.6, s=50, c=np.where(is_es[:, None], RED, CORAL))
     ax.set_xlabel('Query Latency (seconds)')
     ax.set_ylabel('Throughput (queries/sec)')
     ax.set_title('Query Latency vs Throughput')
@@ -404,22 +306,196 @@ def check_and_plot():
     
     # Trade-off: Index size vs Memory
     ax = fig.add_subplot(gs[2, 2])
-    sizes = [c['disk_size_mb'] for c in all_configs]
-    memory = [c['memory_mb'] for c in all_configs]
-    colors = ['red' if 'ES' in c['identifier'] else 'seagreen' for c in all_configs]
-    ax.scatter(sizes, memory, alpha=0.6, s=50, c=colors)
+    ax.scatter(sizes, memory, alpha=0.6, s=50, c=np.where(is_es[:, None], RED, SEAGREEN))
     ax.set_xlabel('Index Size (MB)')
     ax.set_ylabel('Memory Usage (MB)')
     ax.set_title('Index Size vs Memory Usage')
     ax.grid(alpha=0.3)
     
-    plt.savefig(plots_dir / 'comparison_summary.png', dpi=300, bbox_inches='tight')
-    print(f"  Saved: comparison_summary.png")
-    plt.close()
+    return fig
+
+def _table_figure(rows):
+    """Build a table of key metrics, one row per config."""
+    fig = Figure(figsize=(10, 4), layout='constrained')
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    ax.axis('off')
+    ax.set_title('Benchmark Results', fontweight='bold')
+    
+    if rows:
+        table = ax.table(cellText=rows,
+                         colLabels=['Config', 'P95(ms)', 'QPS', 'Size(MB)'],
+                         cellLoc='center',
+                         loc='center')
+        table.auto_set_font_size(False)
+        table.set_fontsize(8)
+        table.scale(1, 2)
+    
+    return fig
+
+def _save_figure(build, path, save_kw, *args):
+    """Build one figure and write it to path; runs in a worker process."""
+    build(*args).savefig(path, **save_kw)
+    return path.name
+
+SUMMARY_FILE = 'comparison_summary.png'
+TABLE_FILE = 'summary_table.png'
+PDF_FILE = 'all_plots.pdf'
+TABLE_ROWS = 6
+
+def plots_up_to_date(plots_dir, expected, results_file='benchmark_results.json'):
+    """True if every expected plot exists and is at least as new as the results."""
+    results_mtime = Path(results_file).stat().st_mtime
+    for filename in expected:
+        path = plots_dir / filename
+        if not path.exists() or path.stat().st_mtime < results_mtime:
+            return False
+    return True
+
+def check_and_plot(force=False, as_pdf=False, results_file='benchmark_results.json'):
+    """Check plots against benchmark data and regenerate if needed.
+    
+    Args:
+        force: Regenerate even if every plot is newer than the results
+        as_pdf: Write every figure as a page of plots/all_plots.pdf
+            instead of one PNG per figure
+        results_file: Benchmark results JSON to plot
+    """
+    plots_dir = Path('plots')
+    if as_pdf:
+        expected = [PDF_FILE]
+    else:
+        expected = [filename for filename, *_ in FIGURES] + [SUMMARY_FILE, TABLE_FILE]
+    if not force and plots_up_to_date(plots_dir, expected, results_file):
+        print(f"Plots are up to date with {results_file} (use --force to regenerate)")
+        return
+    
+    print("Loading benchmark data...")
+    data, parsed = load_parsed_results(results_file)
+    
+    print(f"Found {len(data)} benchmark configurations\n")
+    
+    # Organize data by categories: one label per config for each dimension,
+    # plus a single metric matrix that every group mean is computed from
+    datastore_labels = []
+    compression_labels = []
+    index_type_labels = []
+    query_proc_labels = []
+    optimization_labels = []
+    grouped = []
+    
+    for config, codes in zip(data, parsed):
+        # Configuration codes from the identifier (format: SelfIndex_i{x}d{y}c{z}q{w}o{opt})
+        if codes is None:
+            continue
+        
+        idx_type = codes['i']
+        datastore = codes['d']
+        compression = codes['c']
+        query_proc = codes['q']
+        optimization = codes['o']
+        
+        # Datastore (y)
+        datastore_labels.append({'1': 'Custom/Pickle', '2': 'SQLite', '3': 'PostgreSQL'}.get(datastore, f'DS_{datastore}'))
+        
+        # Compression (z)
+        compression_labels.append({'1': 'None', '2': 'VByte', '3': 'zlib'}.get(compression, f'Comp_{compression}'))
+        
+        # Index type (x)
+        index_type_labels.append({'1': 'Boolean', '2': 'WordCount', '3': 'TF-IDF'}.get(idx_type, f'Idx_{idx_type}'))
+        
+        # Query processing (q)
+        query_proc_labels.append({'T': 'TAAT', 'D': 'DAAT'}.get(query_proc, f'QP_{query_proc}'))
+        
+        # Optimization (o)
+        optimization_labels.append({'0': 'None', 'sp': 'Skip Pointers', 'th': 'Threshold', 'es': 'Early Stop'}.get(optimization, optimization))
+        
+        grouped.append(config)
+    
+    # Missing metrics become NaN and are ignored by the group means
+    metrics = np.fromiter((c.get(key, np.nan) for c in grouped for key in METRICS),
+                          dtype=np.float64, count=len(grouped) * len(METRICS))
+    metrics = metrics.reshape(len(grouped), len(METRICS))
+    
+    groups = {
+        'datastore': group_means(datastore_labels, metrics),
+        'compression': group_means(compression_labels, metrics),
+        'index_type': group_means(index_type_labels, metrics),
+        'query_proc': group_means(query_proc_labels, metrics),
+        'optimization': group_means(optimization_labels, metrics),
+    }
+    datastores = groups['datastore'][0]
+    compressions = groups['compression'][0]
+    index_types = groups['index_type'][0]
+    query_procs = groups['query_proc'][0]
+    optimizations = groups['optimization'][0]
+    
+    # Print summary
+    print("Configuration breakdown:")
+    print(f"  Datastores: {datastores}")
+    print(f"  Compressions: {compressions}")
+    print(f"  Index types: {index_types}")
+    print(f"  Query processing: {query_procs}")
+    print(f"  Optimizations: {optimizations}")
+    print()
+    
+    # Generate plots
+    plots_dir.mkdir(exist_ok=True)
+    
+    # Aggregation happens here once; workers only receive the small per-plot arrays
+    jobs = []
+    for filename, title, dimension, panel_specs, rotation in FIGURES:
+        labels, means = groups[dimension]
+        panels = [(_panel_values(metric, means), panel_title, ylabel, color, metric in DERIVED)
+                  for metric, panel_title, ylabel, color in panel_specs]
+        jobs.append((filename, _comparison_figure, SAVE_KW, (title, labels, panels, rotation)))
+    
+    # Overall comparison summary
+    # Per-config metric arrays shared by the histograms and trade-off scatters
+    n_configs = len(data)
+    times = np.fromiter((c['avg_latency'] for c in data), dtype=np.float64, count=n_configs)
+    sizes = np.fromiter((c['disk_size_mb'] for c in data), dtype=np.float64, count=n_configs)
+    throughputs = np.fromiter((c['throughput'] for c in data), dtype=np.float64, count=n_configs)
+    memory = np.fromiter((c['memory_mb'] for c in data), dtype=np.float64, count=n_configs)
+    is_es = np.fromiter(('ES' in c['identifier'] for c in data), dtype=bool, count=n_configs)
+    
+    # Top-N fastest configs by partial partition instead of sorting everything
+    top_n = min(10, n_configs)
+    top_idx = np.argpartition(times, top_n - 1)[:top_n] if top_n else np.zeros(0, dtype=np.intp)
+    top_idx = top_idx[np.argsort(times[top_idx], kind='stable')]
+    names = [_short_identifier(data[i]['identifier']) for i in top_idx]
+    jobs.append((SUMMARY_FILE, _summary_figure, SUMMARY_SAVE_KW,
+                 (names, times[top_idx], times, sizes, throughputs, memory, is_es)))
+    
+    # Key metrics of the first configurations as a table
+    rows = [[c['identifier'][:15], f"{c['p95_latency']*1000:.1f}",
+             f"{c['throughput']:.1f}", f"{c['disk_size_mb']:.1f}"] for c in data[:TABLE_ROWS]]
+    jobs.append((TABLE_FILE, _table_figure, SAVE_KW, (rows,)))
+    
+    print(f"Generating {len(jobs)} plots...")
+    if as_pdf:
+        # One PDF session shares the font and text layout caches across pages
+        with PdfPages(plots_dir / PDF_FILE) as pdf:
+            for _, build, _, args in jobs:
+                pdf.savefig(build(*args))
+        print(f"  Saved: {PDF_FILE}")
+    else:
+        # Each figure renders and PNG-encodes independently, so fan them out
+        with ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as executor:
+            futures = [executor.submit(_save_figure, build, plots_dir / filename, save_kw, *args)
+                       for filename, build, save_kw, args in jobs]
+            for future in futures:
+                print(f"  Saved: {future.result()}")
     
     print("\n" + "="*60)
     print("✓ All plots regenerated successfully!")
     print("="*60)
 
 if __name__ == "__main__":
-    check_and_plot()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--force', action='store_true',
+                        help='Regenerate plots even if they are newer than benchmark_results.json')
+    parser.add_argument('--pdf', action='store_true',
+                        help='Write all plots into a single plots/all_plots.pdf')
+    args = parser.parse_args()
+    check_and_plot(force=args.force, as_pdf=args.pdf)
@@ -0,0 +1,182 @@
+import math
+import struct
+from collections.abc import Sequence
+from typing import Callable, List, Optional, Tuple, Union
+import numpy as np
+
+# Header: posting count, score column kind. Term counts always equal the
+# position counts, so a count column is not stored twice
+_HEADER = struct.Struct('<IB')
+_NO_SCORES, _COUNT_SCORES, _QUANT_SCORES = 0, 1, 2
+
+def quantize_scores(scores: np.ndarray) -> bytes:
+    """Quantize non-negative scores to 8-bit codes on a per-list scale.
+    
+    Returns:
+        float32 scale || one uint8 code per score (score ~= code * scale)
+    """
+    scale = np.float32(scores.max() / 255 if len(scores) else 0)
+    if scale > 0:
+        codes = np.clip(np.round(scores / scale), 0, 255).astype(np.uint8)
+    else:
+        codes = np.zeros(len(scores), dtype=np.uint8)
+    return scale.tobytes() + codes.tobytes()
+
+def dequantize_scores(buf, n: int, offset: int = 0) -> np.ndarray:
+    """Decode n scores written by quantize_scores at offset in buf, as float64."""
+    scale = np.frombuffer(buf, dtype=np.float32, count=1, offset=offset)[0]
+    codes = np.frombuffer(buf, dtype=np.uint8, count=n, offset=offset + 4)
+    return codes * np.float64(scale)
+
+class ColumnarPostings(Sequence):
+    """Posting list stored as parallel numpy columns.
+    
+    Iterates as the tuple postings MySelfIndex builds: (doc_id, positions) when
+    there is no score column, otherwise (doc_id, count_or_score, positions), each
+    wrapped as (posting, skip_to) when skip pointers are enabled. Positions may
+    be decoded lazily, on first access, since only phrase queries read them.
+    """
+    
+    __slots__ = ('doc_ids', 'scores', 'counts', '_positions', '_load_positions', 'skips',
+                 '_tuples', '_max_score')
+    
+    def __init__(self, doc_ids: np.ndarray, scores: Optional[np.ndarray], counts: np.ndarray,
+                 positions: Union[np.ndarray, Callable[[], np.ndarray]], skips: bool = False):
+        """
+        Args:
+            doc_ids: Sorted int32 doc ids
+            scores: Per-posting term counts (the counts array) or TF-IDF scores (float64), or None.
+                TF-IDF scores are stored 8-bit quantized per list
+            counts: Number of positions of each posting
+            positions: All postings' positions, concatenated in doc order, or a
+                function decoding them on first access
+            skips: Whether iteration yields (posting, skip_to) pairs
+        """
+        self.doc_ids = doc_ids
+        self.scores = scores
+        self.counts = counts
+        if callable(positions):
+            self._positions, self._load_positions = None, positions
+        else:
+            self._positions, self._load_positions = positions, None
+        self.skips = skips
+        self._tuples = None
+        self._max_score = None
+    
+    @property
+    def positions(self) -> np.ndarray:
+        """All postings' positions, decoded on first access if stored lazily."""
+        if self._positions is None:
+            self._positions = self._load_positions()
+            self._load_positions = None
+        return self._positions
+    
+    @classmethod
+    def from_postings(cls, postings: List, skips: bool = False) -> 'ColumnarPostings':
+        """Build columns from tuple postings (without skip pointers)."""
+        positions = [p[-1] for p in postings]
+        counts = np.fromiter(map(len, positions), dtype=np.int32, count=len(postings))
+        doc_ids = np.fromiter((p[0] for p in postings), dtype=np.int32, count=len(postings))
+        
+        scores = None
+        if postings and len(postings[0]) == 3:
+            if isinstance(postings[0][1], float):
+                scores = np.fromiter((p[1] for p in postings), dtype=np.float64, count=len(postings))
+            else:
+                scores = counts
+        
+        flat = np.fromiter((pos for plist in positions for pos in plist), dtype=np.int32,
+                           count=int(counts.sum()))
+        return cls(doc_ids, scores, counts, flat, skips)
+    
+    @classmethod
+    def from_bytes(cls, buf: bytes, skips: bool = False,
+                   positions: Union[np.ndarray, Callable[[], np.ndarray], None] = None) -> 'ColumnarPostings':
+        """Wrap a buffer written by to_bytes without copying the columns.
+        
+        Args:
+            buf: Output of to_bytes, or of columns_to_bytes when positions is given
+            skips: Whether iteration yields (posting, skip_to) pairs
+            positions: Positions stored apart from buf, or a function decoding them
+        """
+        n, kind = _HEADER.unpack_from(buf)
+        offset = _HEADER.size
+        
+        doc_ids = np.frombuffer(buf, dtype=np.int32, count=n, offset=offset)
+        offset += 4 * n
+        counts = np.frombuffer(buf, dtype=np.int32, count=n, offset=offset)
+        offset += 4 * n
+        
+        scores = None
+        if kind == _COUNT_SCORES:
+            scores = counts
+        elif kind == _QUANT_SCORES:
+            scores = dequantize_scores(buf, n, offset)
+            offset += 4 + n
+        
+        if positions is None:
+            positions = np.frombuffer(buf, dtype=np.int32, offset=offset)
+        return cls(doc_ids, scores, counts, positions, skips)
+    
+    def to_bytes(self) -> bytes:
+        """Serialize as header || doc_ids || counts || scores || positions."""
+        return self.columns_to_bytes() + self.positions.astype(np.int32).tobytes()
+    
+    def columns_to_bytes(self) -> bytes:
+        """Serialize everything but the positions, as header || doc_ids || counts || scores."""
+        if self.scores is None:
+            kind, scores = _NO_SCORES, b''
+        elif self.scores.dtype == np.float64:
+            kind, scores = _QUANT_SCORES, quantize_scores(self.scores)
+        else:
+            kind, scores = _COUNT_SCORES, b''
+        
+        return b''.join((_HEADER.pack(len(self.doc_ids), kind),
+                         self.doc_ids.astype(np.int32).tobytes(),
+                         self.counts.astype(np.int32).tobytes(),
+                         scores))
+    
+    def max_score(self) -> float:
+        """Largest score in the list (0.0 when empty), computed once per decoded list."""
+        if self._max_score is None:
+            self._max_score = float(self.scores.max(initial=0))
+        return self._max_score
+    
+    def occurrences(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Parallel int64 doc id / position arrays, one entry per term occurrence."""
+        return (np.repeat(self.doc_ids.astype(np.int64), self.counts),
+                self.positions.astype(np.int64))
+    
+    def _materialize(self) -> List:
+        """Build (and keep) the tuple form for iteration and indexing."""
+        if self._tuples is None:
+            ends = np.cumsum(self.counts)
+            positions = [plist.tolist() for plist in np.split(self.positions, ends[:-1])]
+            doc_ids = self.doc_ids.tolist()
+            
+            if self.scores is None:
+                postings = list(zip(doc_ids, positions))
+            else:
+                postings = list(zip(doc_ids, self.scores.tolist(), positions))
+            
+            if self.skips:
+                # Skip pointers every sqrt(n) entries
+                n = len(postings)
+                skip_distance = int(math.sqrt(n)) if n > 0 else 1
+                postings = [(posting, i + skip_distance if i + skip_distance < n else None)
+                            for i, posting in enumerate(postings)]
+            
+            self._tuples = postings
+        return self._tuples
+    
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+    
+    def __getitem__(self, i):
+        return self._materialize()[i]
+    
+    def __iter__(self):
+        return iter(self._materialize())
+    
+    def __eq__(self, other) -> bool:
+        return list(self) == list(other)
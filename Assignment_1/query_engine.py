@@ -1,5 +1,20 @@
-from typing import List, Set, Dict, Tuple
+import functools
+from itertools import chain
+from typing import List, Dict, Optional, Tuple
+import numpy as np
 from query_parser import *
+from _kernels import _accumulate_scores, intersect_sorted
+from postings import ColumnarPostings
+
+# Shared empty result; numpy set operations never modify their inputs
+_NO_DOCS = np.empty(0, dtype=np.int32)
+
+# Terms in more than this fraction of documents are evaluated as dense bitmaps
+_DENSE_FRACTION = 0.1
+
+def _is_bitmap(docs: np.ndarray) -> bool:
+    """Whether a TAAT result is a dense boolean bitmap rather than a doc id array."""
+    return docs.dtype == np.bool_
 
 class QueryEngine:
     """Execute parsed queries against the inverted index."""
@@ -14,56 +29,86 @@ class QueryEngine:
         self.index = index
         self.doc_count = doc_count
         self.use_skip_pointers = use_skip_pointers
+        
+        # Phrase terms' (doc, position) arrays and terms' doc id arrays or bitmaps,
+        # reused while the engine serves the same index
+        self._occurrences = functools.lru_cache(maxsize=1024)(self._load_occurrences)
+        self._term_docs = functools.lru_cache(maxsize=1024)(self._get_term_docs)
     
-    def execute(self, query_node: QueryNode, mode: str = 'TAAT') -> List[Tuple[str, float]]:
+    def execute(self, query_node: QueryNode, mode: str = 'TAAT',
+                k: Optional[int] = None) -> List[Tuple[int, float]]:
         """
         Execute query and return results.
         
         Args:
             query_node: Parsed query AST
             mode: 'TAAT' (Term-at-a-Time) or 'DAAT' (Document-at-a-Time)
+            k: Return only the first k results (None for all)
             
         Returns:
-            List of (doc_id, score) tuples
+            List of (integer doc id, score) tuples
         """
         if mode == 'TAAT':
-            return self._execute_taat(query_node)
+            return self._execute_taat(query_node, k)
         else:
-            return self._execute_daat(query_node)
+            return self._execute_daat(query_node, k)
     
-    def _execute_taat(self, node: QueryNode) -> List[Tuple[str, float]]:
+    def _execute_taat(self, node: QueryNode, k: Optional[int] = None) -> List[Tuple[int, float]]:
         """Term-at-a-Time execution."""
-        result_set = self._evaluate_node_taat(node)
+        result_docs = self._to_doc_ids(self._evaluate_node_taat(node))
         
-        # Convert set to list with scores
-        return [(doc_id, 1.0) for doc_id in result_set]
+        # Convert doc id array to list with scores
+        return [(doc_id, 1.0) for doc_id in result_docs[:k].tolist()]
     
-    def _evaluate_node_taat(self, node: QueryNode) -> Set[str]:
-        """Recursively evaluate query node in TAAT mode."""
+    def _evaluate_node_taat(self, node: QueryNode) -> np.ndarray:
+        """Recursively evaluate query node in TAAT mode.
+        
+        Returns:
+            Sorted array of unique integer doc ids, or a boolean bitmap over
+            all doc ids for frequent terms
+        """
         if isinstance(node, TermNode):
-            return self._get_term_docs(node.term)
+            return self._term_docs(node.term.lower())
         
         elif isinstance(node, PhraseNode):
             return self._phrase_query(node.terms)
         
         elif isinstance(node, NotNode):
-            all_docs = set(self.index.get('__all_docs__', []))
             child_docs = self._evaluate_node_taat(node.child)
-            return all_docs - child_docs
+            if _is_bitmap(child_docs):
+                return ~child_docs
+            # Doc ids are the contiguous range 0..doc_count-1, so the complement
+            # of a sparse list is dense: clear its docs in a bitmap instead of
+            # sorting the full id range against it
+            bitmap = np.ones(self.doc_count, dtype=bool)
+            bitmap[child_docs] = False
+            return bitmap
         
         elif isinstance(node, AndNode):
-            left_docs = self._evaluate_node_taat(node.left)
-            right_docs = self._evaluate_node_taat(node.right)
-            return self._intersect(left_docs, right_docs)
+            # Intersect a whole AND chain shortest operand first, so every step is
+            # bounded by the smallest list seen so far (bitmaps span all docs)
+            operands = sorted(map(self._evaluate_node_taat, self._chain_operands(node, AndNode)), key=len)
+            result = operands[0]
+            for docs in operands[1:]:
+                if not len(result):
+                    break
+                result = self._intersect(result, docs)
+            return result
         
         elif isinstance(node, OrNode):
-            left_docs = self._evaluate_node_taat(node.left)
-            right_docs = self._evaluate_node_taat(node.right)
-            return left_docs | right_docs
+            # Union a whole OR chain at once rather than materialising every pairwise union
+            return self._union_all([self._evaluate_node_taat(child)
+                                    for child in self._chain_operands(node, OrNode)])
         
-        return set()
+        return _NO_DOCS
     
-    def _execute_daat(self, node: QueryNode) -> List[Tuple[str, float]]:
+    def _chain_operands(self, node: QueryNode, node_type: type) -> List[QueryNode]:
+        """Flatten a chain of nested node_type (AND or OR) nodes into its other operands."""
+        if isinstance(node, node_type):
+            return self._chain_operands(node.left, node_type) + self._chain_operands(node.right, node_type)
+        return [node]
+    
+    def _execute_daat(self, node: QueryNode, k: Optional[int] = None) -> List[Tuple[int, float]]:
         """Document-at-a-Time execution."""
         # Collect all terms and their posting lists
         term_postings = self._collect_term_postings(node)
@@ -71,18 +116,75 @@ class QueryEngine:
         if not term_postings:
             return []
         
-        # Score documents
-        doc_scores = {}
+        # Scoring reads the doc id and score columns, so skip pointers do not matter
+        postings_lists = list(term_postings.values())
+        if k is not None and all(isinstance(postings, ColumnarPostings) and postings.scores is not None
+                                 for postings in postings_lists):
+            return self._top_k_daat(postings_lists, k)
+        
+        # Flatten postings into parallel doc_id / score arrays
+        doc_ids = []
+        scores = []
         
         for term, postings in term_postings.items():
-            for doc_id, score, positions in postings:
-                if doc_id not in doc_scores:
-                    doc_scores[doc_id] = 0.0
-                doc_scores[doc_id] += score
+            if isinstance(postings, ColumnarPostings):
+                doc_ids.append(postings.doc_ids)
+                scores.append(postings.scores)
+            else:
+                doc_ids.append(np.fromiter((p[0] for p in postings), dtype=np.int64, count=len(postings)))
+                scores.append(np.fromiter((p[1] for p in postings), dtype=np.float64, count=len(postings)))
+        
+        # Map doc_ids to dense ordinals and score documents
+        unique_ids, doc_ords = np.unique(np.concatenate(doc_ids), return_inverse=True)
+        totals = _accumulate_scores(doc_ords.astype(np.int64),
+                                    np.concatenate(scores).astype(np.float64),
+                                    len(unique_ids))
         
         # Sort by score
-        results = sorted(doc_scores.items(), key=lambda x: x[1], reverse=True)
-        return results
+        order = np.argsort(-totals, kind='stable')[:k]
+        return [(int(unique_ids[i]), float(totals[i])) for i in order]
+    
+    def _top_k_daat(self, postings_lists: List[ColumnarPostings], k: int) -> List[Tuple[int, float]]:
+        """Score the k best documents of scored columnar postings with MaxScore pruning.
+        
+        Lists are visited by decreasing maximum score, collecting candidate
+        documents with their partial scores. Once the maxima of the unvisited
+        lists sum to less than the k-th best partial score, a document missing
+        from every visited list cannot reach the top k, so the unvisited lists
+        are only probed for the candidates. Results match the unpruned ranking.
+        """
+        max_scores = [postings.max_score() for postings in postings_lists]
+        by_max = sorted(range(len(postings_lists)), key=lambda i: -max_scores[i])
+        
+        candidates = _NO_DOCS
+        partial = np.empty(0, dtype=np.float64)
+        for visited, i in enumerate(by_max):
+            remaining = sum(max_scores[j] for j in by_max[visited:])
+            if len(candidates) > k:
+                kth_best = np.partition(partial, len(partial) - k)[len(partial) - k]
+                # Scores are non-negative; the margin absorbs summation order rounding
+                if remaining * (1 + 1e-9) < kth_best:
+                    break
+            
+            postings = postings_lists[i]
+            merged = np.union1d(candidates, postings.doc_ids)
+            merged_partial = np.zeros(len(merged), dtype=np.float64)
+            merged_partial[np.searchsorted(merged, candidates)] = partial
+            merged_partial[np.searchsorted(merged, postings.doc_ids)] += postings.scores
+            candidates, partial = merged, merged_partial
+        
+        # Exact totals, summed in query term order like the unpruned path
+        totals = np.zeros(len(candidates), dtype=np.float64)
+        for postings in postings_lists:
+            if not len(postings.doc_ids):
+                continue
+            idx = np.minimum(np.searchsorted(postings.doc_ids, candidates), len(postings.doc_ids) - 1)
+            hit = postings.doc_ids[idx] == candidates
+            totals[hit] += postings.scores[idx[hit]]
+        
+        # Ties keep doc id order, as in the unpruned sort
+        order = np.argsort(-totals, kind='stable')[:k]
+        return [(int(candidates[i]), float(totals[i])) for i in order]
     
     def _collect_term_postings(self, node: QueryNode) -> Dict[str, List]:
         """Collect all term postings from the query tree."""
@@ -102,98 +204,119 @@ class QueryEngine:
         
         return postings
     
-    def _get_term_docs(self, term: str) -> Set[str]:
-        """Get document IDs containing the term."""
+    def _get_term_docs(self, term: str) -> np.ndarray:
+        """Get the sorted integer document IDs containing the term (uncached, see _term_docs)."""
         term = term.lower()
         if term not in self.index:
-            return set()
+            return _NO_DOCS
         
         postings = self.index[term]
         
-        # Handle compressed postings (bytes) - need to decompress in MySelfIndex
-        # For now, assume index stores decompressed postings or is accessed through MySelfIndex
-        if isinstance(postings, bytes):
-            # This shouldn't happen if MySelfIndex properly exposes index
-            import pickle
-            postings = pickle.loads(postings)
+        # Columnar postings already hold the sorted doc id array
+        if isinstance(postings, ColumnarPostings):
+            return self._as_term_docs(postings.doc_ids)
         
         # Handle skip pointers if present
         if self.use_skip_pointers and postings and isinstance(postings[0], tuple) and len(postings[0]) == 2:
             # Format: [(posting, skip_to), ...]
             # posting can be (doc_id, score, positions) or (doc_id, positions)
-            return {p[0][0] if isinstance(p[0], tuple) else p[0] for p in postings}
+            doc_ids = (p[0][0] if isinstance(p[0], tuple) else p[0] for p in postings)
         else:
             # Regular postings: [(doc_id, ...), ...]
-            return {doc_id for doc_id, *_ in postings}
+            doc_ids = (p[0] for p in postings)
+        
+        # Postings are sorted by doc id, so the array is too
+        return self._as_term_docs(np.fromiter(doc_ids, dtype=np.int32, count=len(postings)))
+    
+    def _as_term_docs(self, doc_ids: np.ndarray) -> np.ndarray:
+        """Keep a term's doc ids as an array, or a bitmap if the term is frequent."""
+        if len(doc_ids) > _DENSE_FRACTION * self.doc_count:
+            bitmap = np.zeros(self.doc_count, dtype=bool)
+            bitmap[doc_ids] = True
+            # Cached and shared between queries, so never modified in place
+            bitmap.flags.writeable = False
+            return bitmap
+        return doc_ids
+    
+    def _to_doc_ids(self, docs: np.ndarray) -> np.ndarray:
+        """Convert a TAAT result to a sorted doc id array."""
+        if _is_bitmap(docs):
+            return np.flatnonzero(docs).astype(np.int32)
+        return docs
     
-    def _intersect(self, list1: Set[str], list2: Set[str]) -> Set[str]:
-        """Intersect two document sets."""
-        return list1 & list2
+    def _intersect(self, list1: np.ndarray, list2: np.ndarray) -> np.ndarray:
+        """Intersect two sorted document id arrays or bitmaps.
+        
+        Skip-pointer indexes follow sqrt(n) skips during the merge, the same
+        spacing MySelfIndex stores, so they also apply to intermediate results.
+        A much shorter list instead descends the longer one by binary search.
+        """
+        if _is_bitmap(list1) and _is_bitmap(list2):
+            return list1 & list2
+        elif _is_bitmap(list1):
+            return list2[list1[list2]]
+        elif _is_bitmap(list2):
+            return list1[list2[list1]]
+        return intersect_sorted(list1, list2, self.use_skip_pointers)
     
-    def _phrase_query(self, terms: List[str]) -> Set[str]:
+    def _union_all(self, operands: List[np.ndarray]) -> np.ndarray:
+        """Union any number of sorted document id arrays or bitmaps in one pass."""
+        if len(operands) == 1:
+            return operands[0]
+        
+        bitmaps = [docs for docs in operands if _is_bitmap(docs)]
+        arrays = [docs for docs in operands if not _is_bitmap(docs)]
+        if bitmaps:
+            bitmap = np.logical_or.reduce(bitmaps) if len(bitmaps) > 1 else bitmaps[0].copy()
+            for doc_ids in arrays:
+                bitmap[doc_ids] = True
+            return bitmap
+        return np.unique(np.concatenate(arrays))
+    
+    def _phrase_query(self, terms: List[str]) -> np.ndarray:
         """Find documents containing the phrase."""
         if not terms:
-            return set()
+            return _NO_DOCS
         
-        # Get postings for all terms
+        # Get sorted (doc, position) occurrence arrays for all terms
         terms = [t.lower() for t in terms]
-        term_postings = []
+        if any(term not in self.index for term in terms):
+            return _NO_DOCS
+        occurrences = [self._occurrences(term) for term in terms]
         
-        for term in terms:
-            if term not in self.index:
-                return set()
-            postings = self.index[term]
-            
-            # Handle compressed postings
-            if isinstance(postings, bytes):
-                import pickle
-                postings = pickle.loads(postings)
-            
-            # Handle skip pointers
-            if self.use_skip_pointers and postings and isinstance(postings[0], tuple) and len(postings[0]) == 2:
-                # Extract actual postings from (posting, skip_to) format
-                postings = [p[0] for p in postings]
-            
-            term_postings.append(postings)
-        
-        # Find documents containing all terms
-        doc_sets = [set(doc_id for doc_id, *_ in postings) for postings in term_postings]
-        candidate_docs = set.intersection(*doc_sets)
-        
-        # Check for phrase in candidate documents
-        result_docs = set()
-        
-        for doc_id in candidate_docs:
-            # Get positions for each term in this document
-            term_positions = []
-            for i, term in enumerate(terms):
-                for doc, *rest in term_postings[i]:
-                    if doc == doc_id:
-                        positions = rest[-1] if rest else []
-                        term_positions.append(set(positions))
-                        break
-            
-            # Check if terms appear consecutively
-            if self._check_phrase_positions(term_positions):
-                result_docs.add(doc_id)
+        # Key every occurrence as doc * stride + position. The stride leaves a gap
+        # of more than len(terms) after each document's last position, so phrase
+        # offsets never run into the neighbouring document
+        stride = max(int(positions.max(initial=0)) for _, positions in occurrences) + len(terms) + 1
+        keys = [docs * stride + positions for docs, positions in occurrences]
+        
+        # Scan the rarest term; each occurrence fixes where every other term must appear
+        anchor = min(range(len(keys)), key=lambda i: len(keys[i]))
+        starts = keys[anchor] - anchor
+        match = np.ones(len(starts), dtype=bool)
         
-        return result_docs
+        for i, term_keys in enumerate(keys):
+            if i == anchor or not match.any():
+                continue
+            targets = starts + i
+            idx = np.minimum(np.searchsorted(term_keys, targets), len(term_keys) - 1)
+            match &= term_keys[idx] == targets
+        
+        return np.unique(starts[match] // stride).astype(np.int32)
     
-    def _check_phrase_positions(self, term_positions: List[Set[int]]) -> bool:
-        """Check if term positions form a phrase."""
-        if not term_positions:
-            return False
-        
-        # For each position of the first term
-        for pos in term_positions[0]:
-            match = True
-            # Check if subsequent terms appear at consecutive positions
-            for i in range(1, len(term_positions)):
-                if (pos + i) not in term_positions[i]:
-                    match = False
-                    break
-            
-            if match:
-                return True
+    def _load_occurrences(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Flatten a term's postings into parallel doc id / position arrays, sorted by (doc, position)."""
+        postings = self.index[term]
+        if isinstance(postings, ColumnarPostings):
+            return postings.occurrences()
+        
+        # Handle skip pointers
+        if self.use_skip_pointers and postings and isinstance(postings[0], tuple) and len(postings[0]) == 2:
+            # Extract actual postings from (posting, skip_to) format
+            postings = [p[0] for p in postings]
         
-        return False
\ No newline at end of file
+        positions = [rest[-1] if rest else [] for _, *rest in postings]
+        counts = np.fromiter(map(len, positions), dtype=np.int64, count=len(postings))
+        docs = np.fromiter((p[0] for p in postings), dtype=np.int64, count=len(postings))
+        flat = np.fromiter(chain.from_iterable(positions), dtype=np.int64, count=int(counts.sum()))
+        return np.repeat(docs, counts), flat
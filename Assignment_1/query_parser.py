@@ -1,11 +1,23 @@
+import functools
 import re
 from typing import List, Union
 
+# Single precompiled scanner: quoted terms/phrases, operators and parentheses
+_TOKEN_RE = re.compile(r'"[^"]+"|\bAND\b|\bOR\b|\bNOT\b|[()]')
+
+# Operator precedence for the shunting-yard loop
+_PREC = {'OR': 1, 'AND': 2, 'NOT': 3}
+_OPS = frozenset(_PREC)
+
 class QueryNode:
     """Represents a node in the query parse tree."""
-    pass
+    
+    # Nodes are plain records; slots keep the many small trees free of instance dicts
+    __slots__ = ()
 
 class TermNode(QueryNode):
+    __slots__ = ('term',)
+    
     def __init__(self, term: str):
         self.term = term
     
@@ -13,6 +25,8 @@ class TermNode(QueryNode):
         return f'Term("{self.term}")'
 
 class PhraseNode(QueryNode):
+    __slots__ = ('terms',)
+    
     def __init__(self, terms: List[str]):
         self.terms = terms
     
@@ -20,6 +34,8 @@ class PhraseNode(QueryNode):
         return f'Phrase({self.terms})'
 
 class NotNode(QueryNode):
+    __slots__ = ('child',)
+    
     def __init__(self, child: QueryNode):
         self.child = child
     
@@ -27,6 +43,8 @@ class NotNode(QueryNode):
         return f'NOT({self.child})'
 
 class AndNode(QueryNode):
+    __slots__ = ('left', 'right')
+    
     def __init__(self, left: QueryNode, right: QueryNode):
         self.left = left
         self.right = right
@@ -35,6 +53,8 @@ class AndNode(QueryNode):
         return f'({self.left} AND {self.right})'
 
 class OrNode(QueryNode):
+    __slots__ = ('left', 'right')
+    
     def __init__(self, left: QueryNode, right: QueryNode):
         self.left = left
         self.right = right
@@ -45,94 +65,85 @@ class OrNode(QueryNode):
 class QueryParser:
     """Parse boolean queries using Shunting-yard algorithm."""
     
-    def __init__(self):
-        self.precedence = {
-            'OR': 1,
-            'AND': 2,
-            'NOT': 3,
-            'PHRASE': 4
-        }
-    
     def tokenize(self, query: str) -> List[str]:
-        """Tokenize the query string."""
-        # Pattern to match: quoted strings, operators, parentheses
-        pattern = r'"[^"]+"|AND|OR|NOT|\(|\)'
-        tokens = re.findall(pattern, query)
-        return tokens
+        """Tokenize the query string in a single pass of the precompiled scanner."""
+        return _TOKEN_RE.findall(query)
     
     def parse(self, query: str) -> QueryNode:
         """Parse query string into AST."""
-        tokens = self.tokenize(query)
-        
-        if not tokens:
-            return TermNode("")
-        
-        output = []
-        operators = []
-        
-        i = 0
-        while i < len(tokens):
-            token = tokens[i]
-            
-            if token.startswith('"') and token.endswith('"'):
-                # Term or phrase
-                content = token[1:-1]
-                words = content.split()
-                
-                if len(words) > 1:
-                    # It's a phrase
-                    output.append(PhraseNode(words))
-                else:
-                    # Single term
-                    output.append(TermNode(words[0] if words else ""))
-            
-            elif token == '(':
-                operators.append(token)
-            
-            elif token == ')':
-                # Pop until matching '('
-                while operators and operators[-1] != '(':
-                    self._apply_operator(output, operators.pop())
-                
-                if operators:
-                    operators.pop()  # Remove '('
-            
-            elif token in ['AND', 'OR', 'NOT']:
-                # Pop operators with higher or equal precedence
-                while (operators and 
-                       operators[-1] != '(' and 
-                       operators[-1] in self.precedence and
-                       self.precedence[operators[-1]] >= self.precedence[token]):
-                    self._apply_operator(output, operators.pop())
-                
-                operators.append(token)
+        return _parse(query)
+
+# Parse trees are read-only during evaluation, so repeated queries share one. The
+# cache lives at module level: the parser is stateless and no instance is kept alive
+@functools.lru_cache(maxsize=4096)
+def _parse(query: str) -> QueryNode:
+    """Parse query string into AST (cached, see QueryParser.parse)."""
+    tokens = _TOKEN_RE.findall(query)
+    
+    if not tokens:
+        return TermNode("")
+    
+    output = []
+    operators = []
+    prec = _PREC
+    apply_operator = _apply_operator
+    
+    for token in tokens:
+        if token[0] == '"':
+            # Term or phrase
+            content = token[1:-1]
+            words = content.split()
             
-            i += 1
-        
-        # Pop remaining operators
-        while operators:
-            self._apply_operator(output, operators.pop())
+            if len(words) > 1:
+                # It's a phrase
+                output.append(PhraseNode(words))
+            else:
+                # Single term
+                output.append(TermNode(words[0] if words else ""))
         
-        return output[0] if output else TermNode("")
-    
-    def _apply_operator(self, output: List[QueryNode], operator: str):
-        """Apply an operator to the output stack."""
-        if operator == 'NOT':
-            if output:
-                operand = output.pop()
-                output.append(NotNode(operand))
+        elif token == '(':
+            operators.append(token)
         
-        elif operator == 'AND':
-            if len(output) >= 2:
-                right = output.pop()
-                left = output.pop()
-                output.append(AndNode(left, right))
+        elif token == ')':
+            # Pop until matching '('
+            while operators and operators[-1] != '(':
+                apply_operator(output, operators.pop())
+            
+            if operators:
+                operators.pop()  # Remove '('
         
-        elif operator == 'OR':
-            if len(output) >= 2:
-                right = output.pop()
-                left = output.pop()
-                output.append(OrNode(left, right))
+        elif token in _OPS:
+            # Pop operators with higher or equal precedence ('(' has none)
+            token_prec = prec[token]
+            while operators and prec.get(operators[-1], 0) >= token_prec:
+                apply_operator(output, operators.pop())
+            
+            operators.append(token)
+    
+    # Pop remaining operators
+    while operators:
+        apply_operator(output, operators.pop())
+    
+    return output[0] if output else TermNode("")
+
+def _apply_operator(output: List[QueryNode], operator: str):
+    """Apply an operator to the output stack."""
+    if operator == 'NOT':
+        if output:
+            operand = output.pop()
+            output.append(NotNode(operand))
+    
+    elif operator == 'AND':
+        if len(output) >= 2:
+            right = output.pop()
+            left = output.pop()
+            output.append(AndNode(left, right))
+    
+    elif operator == 'OR':
+        if len(output) >= 2:
+            right = output.pop()
+            left = output.pop()
+            output.append(OrNode(left, right))
 
 # Simple usage example
 if __name__ == "__main__":
@@ -1,21 +1,218 @@
 import sqlite3
 import pickle
+import functools
 import json
-import math
 import struct
 import zlib
-from collections import defaultdict
-from typing import Iterable, Tuple, Dict, List
+import os
+import mmap
+import heapq
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from collections.abc import Mapping
+from itertools import islice, groupby
+from operator import itemgetter
+from typing import Iterable, Tuple, Dict, List, Optional, Sequence
 from pathlib import Path
+import numpy as np
 from index_base import IndexBase, IndexInfo, DataStore, Compression, QueryProc, Optimizations
 from preprocess import preprocess
 from query_parser import QueryParser
 from query_engine import QueryEngine
+from postings import ColumnarPostings, quantize_scores, dequantize_scores
+from term_dict import TermDictionary
+from _kernels import streamvbyte_encode, streamvbyte_decode
+
+# orjson is optional; fall back to the stdlib encoder for query results
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# zstandard is optional; CLIB falls back to zlib when it is not installed
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_QUERY_PARSER = QueryParser()
+
+# Results returned per query
+_MAX_RESULTS = 100
+
+# Documents handed to a preprocessing worker per task
+_PREPROCESS_CHUNK_SIZE = 64
+
+# Buffered term positions before create_index spills a sorted run to disk
+_SPILL_POSITIONS = 20_000_000
+
+# Term positions per block handed to _build_postings when merging spilled runs
+_MERGE_BLOCK_POSITIONS = 1_000_000
+
+# zstd level, dictionary size and the number of postings lists the dictionary
+# is trained on (CLIB). Level 9 with a dictionary is smaller than zlib's
+# default level and several times faster to decompress
+_ZSTD_LEVEL = 9
+_ZSTD_DICT_SIZE = 64 * 1024
+_ZSTD_SAMPLES = 2000
+
+# CLIB postings with at least this many bytes of positions compress them as a
+# separate frame; smaller lists keep a single frame
+_CLIB_SPLIT_BYTES = 1024
+
+# DB1 postings blobs above this size go to the flat postings file instead of
+# SQLite overflow pages
+_INLINE_BLOB_LIMIT = 16 * 1024
+
+def _chunked(files: Iterable[Tuple[str, str]], size: int):
+    """Yield lists of up to size (doc_id, content) tuples."""
+    files = iter(files)
+    while chunk := list(islice(files, size)):
+        yield chunk
+
+def _map_bounded(executor: ProcessPoolExecutor, fn, iterable, window: int):
+    """Like executor.map, but keeps at most window tasks in flight.
+    
+    executor.map submits every item before returning, which reads the whole
+    corpus into pending tasks; this pulls input only as results are consumed.
+    """
+    pending = deque()
+    for item in iterable:
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(executor.submit(fn, item))
+    while pending:
+        yield pending.popleft().result()
+
+def _preprocess_chunk(chunk: List[Tuple[str, str]]) -> Tuple[List[str], List[int], List[str],
+                                                              np.ndarray, np.ndarray, np.ndarray]:
+    """Preprocess a chunk of documents in a worker process.
+    
+    Returns:
+        (doc_ids, token counts, chunk vocabulary, and one entry per token in the
+        vocabulary index, chunk-local doc index and position int32 arrays)
+    """
+    doc_ids = []
+    token_counts = []
+    vocab = {}
+    token_terms = []
+    for doc_id, content in chunk:
+        tokens = preprocess(content)
+        doc_ids.append(doc_id)
+        token_counts.append(len(tokens))
+        token_terms.extend([vocab.setdefault(token, len(vocab)) for token in tokens])
+    
+    # Tokens are emitted in doc order, positions counting up from 0 in each doc
+    counts = np.array(token_counts, dtype=np.int32)
+    docs = np.repeat(np.arange(len(chunk), dtype=np.int32), counts)
+    positions = np.arange(len(token_terms), dtype=np.int32) - np.repeat(np.cumsum(counts) - counts, counts)
+    return doc_ids, token_counts, list(vocab), np.array(token_terms, dtype=np.int32), docs, positions
+
+def _sort_block(buffer: List[Tuple[np.ndarray, np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Concatenate buffered (term_id, doc, position) token arrays and sort them by term.
+    
+    Tokens arrive in (doc, position) order, so a stable sort on term id leaves
+    each term's occurrences sorted by doc and position.
+    """
+    terms, docs, positions = (np.concatenate(columns) for columns in zip(*buffer))
+    order = np.argsort(terms, kind='stable')
+    return terms[order], docs[order], positions[order]
+
+def _group_by_term(buffer: List[Tuple[np.ndarray, np.ndarray, np.ndarray]]):
+    """Yield (term_id, docs, positions) per term from buffered token arrays, in term id order."""
+    terms, docs, positions = _sort_block(buffer)
+    bounds = np.flatnonzero(np.diff(terms)) + 1
+    for start, end in zip([0, *bounds.tolist()], [*bounds.tolist(), len(terms)]):
+        if start < end:
+            yield int(terms[start]), docs[start:end], positions[start:end]
+
+def _write_run(buffer: List[Tuple[np.ndarray, np.ndarray, np.ndarray]], run_dir: str) -> str:
+    """Write buffered token arrays to a run file as (term_id, docs, positions) records in term id order."""
+    with tempfile.NamedTemporaryFile(dir=run_dir, suffix='.run', delete=False) as f:
+        for record in _group_by_term(buffer):
+            pickle.dump(record, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return f.name
+
+def _read_run(path: str):
+    """Stream the (term_id, docs, positions) records of a run file."""
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+def _merge_runs(paths: List[str]):
+    """K-way merge run files into sorted (term_ids, docs, positions) blocks of whole terms.
+    
+    Runs are written in indexing order and heapq.merge is stable, so each
+    term's occurrences come out in doc order.
+    """
+    merged = heapq.merge(*(_read_run(path) for path in paths), key=itemgetter(0))
+    block = []
+    block_positions = 0
+    for term_id, records in groupby(merged, key=itemgetter(0)):
+        for _, docs, positions in records:
+            block.append((np.full(len(docs), term_id, dtype=np.int32), docs, positions))
+            block_positions += len(docs)
+        
+        if block_positions >= _MERGE_BLOCK_POSITIONS:
+            yield tuple(np.concatenate(columns) for columns in zip(*block))
+            block = []
+            block_positions = 0
+    
+    if block:
+        yield tuple(np.concatenate(columns) for columns in zip(*block))
+
+def _evenly_spaced(items: Sequence, k: int) -> Sequence:
+    """Up to k items taken at even steps through items."""
+    return items[::max(1, len(items) // k)]
+
+def _sqlite_rows(index: Dict[str, bytes], dat_file):
+    """Yield inverted_index rows, appending large blobs to dat_file.
+    
+    Returns:
+        (term, blob, None, None) for inline blobs, (term, None, offset, length) otherwise
+    """
+    offset = 0
+    for term, blob in index.items():
+        if len(blob) > _INLINE_BLOB_LIMIT:
+            dat_file.write(blob)
+            yield term, None, offset, len(blob)
+            offset += len(blob)
+        else:
+            yield term, blob, None, None
+
+class _PostingsView(Mapping):
+    """Read-only term -> decoded postings view handed to the query engine."""
+    
+    def __init__(self, owner: 'MySelfIndex'):
+        self._owner = owner
+    
+    def __getitem__(self, term: str) -> List:
+        return self._owner._get_postings(term)
+    
+    def __contains__(self, term) -> bool:
+        return term in self._owner.index
+    
+    def __iter__(self):
+        return iter(self._owner.index)
+    
+    def __len__(self) -> int:
+        return len(self._owner.index)
 
 class MySelfIndex(IndexBase):
     """Modular self-implemented search index."""
     
-    def __init__(self, core, info, dstore, qproc, compr, optim):
+    def __init__(self, core, info, dstore, qproc, compr, optim, result_cache_size: int = 0,
+                 build_workers: int = None):
+        """
+        Args:
+            result_cache_size: Number of recent query results to keep (0 disables
+                the cache, so benchmarks keep measuring query evaluation)
+            build_workers: Preprocessing processes for create_index (None for one per CPU)
+        """
         super().__init__(core, info, dstore, qproc, compr, optim)
         
         # Parse strategy flags
@@ -24,220 +221,482 @@ class MySelfIndex(IndexBase):
         self.compression_strategy = Compression[compr]
         self.qproc_strategy = QueryProc[qproc]
         self.optim_strategy = Optimizations[optim]
+        self.build_workers = build_workers
         
         # Index storage
         self.index = {}
+        self.doc_ids = []  # Integer doc id -> original doc_id string
         self.doc_lengths = {}
         self.idf_scores = {}
         self.total_docs = 0
         self.indexed_files = set()
+        self._postings_map = None  # mmap of a loaded DB1 index's large postings
+        self._conn = None  # SQLite connection of the last DB1 index saved or loaded
+        self._conn_path = None
+        self._set_clib_codec('zstd' if zstandard is not None else 'zlib')
+        
+        # Decoded postings of hot terms, the query engine serving them and
+        # optionally whole query results; all are reset whenever self.index changes
+        self._get_postings = functools.lru_cache(maxsize=10_000)(self._decode_term)
+        self._engine = None
+        self._cached_query = None
+        if result_cache_size > 0:
+            self._cached_query = functools.lru_cache(maxsize=result_cache_size)(self._run_query)
         
         # Base directory for index storage
         self.base_dir = Path("indices") / self.identifier_short
         self.base_dir.mkdir(parents=True, exist_ok=True)
-        
-        self.query_parser = QueryParser()
+    
+    def __del__(self):
+        self._close_db()
+    
+    def _db(self, db_path: Path) -> sqlite3.Connection:
+        """SQLite connection to db_path, opened on first use and kept for later saves and loads."""
+        if self._conn is None or self._conn_path != db_path:
+            self._close_db()
+            # The connection may be closed by __del__ in whichever thread runs cyclic
+            # GC; it is only ever used by this instance, one call at a time
+            self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._conn_path = db_path
+            
+            # WAL with relaxed syncing and a 64 MiB page cache
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('PRAGMA temp_store=MEMORY')
+            self._conn.execute('PRAGMA cache_size=-65536')
+        return self._conn
+    
+    def _close_db(self) -> None:
+        """Close the cached SQLite connection, if any."""
+        conn = getattr(self, '_conn', None)
+        if conn is not None:
+            conn.close()
+            self._conn = None
+            self._conn_path = None
     
     def create_index(self, index_id: str, files: Iterable[Tuple[str, str]]) -> None:
         """Create index from files."""
         print(f"Creating index {index_id} with configuration {self.identifier_short}")
         
-        # Build inverted index
-        inverted_index = defaultdict(lambda: defaultdict(list))
+        # Build the inverted index from (term_id, doc_int, position) arrays, one
+        # entry per token. Large corpora spill sorted runs to disk that are
+        # merged back per term
+        self.index = {}
+        term_ids = {}
+        buffer = []
+        buffered_positions = 0
+        runs = []
         doc_lengths = {}
-        doc_count = 0
-        all_doc_ids = []
-        
-        for doc_id, content in files:
-            tokens = preprocess(content)
-            doc_lengths[doc_id] = len(tokens)
-            doc_count += 1
-            all_doc_ids.append(doc_id)
-            self.indexed_files.add(doc_id)
-            
-            # Track term positions
-            for pos, token in enumerate(tokens):
-                inverted_index[token][doc_id].append(pos)
-        
-        self.total_docs = doc_count
-        self.doc_lengths = doc_lengths
+        doc_ids = []
+        token_counts = []
         
-        # Store all doc IDs for NOT operations
-        self.index['__all_docs__'] = all_doc_ids
-        
-        # Build index based on info_strategy
-        for term, doc_positions in inverted_index.items():
-            postings = []
+        with tempfile.TemporaryDirectory(dir=self.base_dir) as run_dir:
+            # Preprocess documents in parallel; merging into the index stays serial.
+            # Reading, preprocessing and merging overlap with a few chunks per worker in flight
+            workers = self.build_workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunks = _map_bounded(executor, _preprocess_chunk,
+                                      _chunked(files, _PREPROCESS_CHUNK_SIZE), 4 * workers)
+                for chunk_doc_ids, chunk_counts, vocab, token_terms, docs, positions in chunks:
+                    # Postings refer to documents by integer id, in indexing order
+                    doc_base = len(doc_ids)
+                    doc_ids.extend(chunk_doc_ids)
+                    token_counts.extend(chunk_counts)
+                    doc_lengths.update(zip(chunk_doc_ids, chunk_counts))
+                    self.indexed_files.update(chunk_doc_ids)
+                    
+                    # Map the chunk's vocabulary onto global term ids
+                    chunk_terms = np.fromiter((term_ids.setdefault(term, len(term_ids)) for term in vocab),
+                                              dtype=np.int32, count=len(vocab))
+                    buffer.append((chunk_terms[token_terms], docs + doc_base, positions))
+                    
+                    buffered_positions += len(positions)
+                    if buffered_positions >= _SPILL_POSITIONS:
+                        runs.append(_write_run(buffer, run_dir))
+                        buffer = []
+                        buffered_positions = 0
             
-            for doc_id, positions in doc_positions.items():
-                if self.info_strategy == IndexInfo.BOOLEAN:
-                    # x=1: (doc_id, [positions])
-                    postings.append((doc_id, positions))
-                
-                elif self.info_strategy == IndexInfo.WORDCOUNT:
-                    # x=2: (doc_id, term_count, [positions])
-                    term_count = len(positions)
-                    postings.append((doc_id, term_count, positions))
-                
-                elif self.info_strategy == IndexInfo.TFIDF:
-                    # x=3: Calculate TF-IDF
-                    tf = len(positions) / doc_lengths[doc_id] if doc_lengths[doc_id] > 0 else 0
-                    postings.append((doc_id, tf, positions))
+            doc_count = len(doc_ids)
+            self.total_docs = doc_count
+            self.doc_ids = doc_ids
+            self.doc_lengths = doc_lengths
             
-            # Calculate IDF for TF-IDF
-            if self.info_strategy == IndexInfo.TFIDF:
-                df = len(postings)
-                idf = math.log(doc_count / df) if df > 0 else 0
-                self.idf_scores[term] = idf
-                
-                # Apply IDF to TF scores
-                postings = [(doc_id, tf * idf, positions) for doc_id, tf, positions in postings]
-            
-            # Sort postings by doc_id
-            postings.sort(key=lambda x: x[0])
-            
-            # Apply skip pointers if enabled (i=1)
-            if self.optim_strategy == Optimizations.Skipping:
-                postings = self._add_skip_pointers(postings)
-            
-            # Apply compression (z=n)
-            compressed_postings = self._compress_postings(postings)
+            if runs:
+                runs.append(_write_run(buffer, run_dir))
+                blocks = _merge_runs(runs)
+            elif buffer:
+                blocks = [_sort_block(buffer)]
+            else:
+                blocks = []
+            buffer = []
             
-            self.index[term] = compressed_postings
+            # Postings are built and compressed a block of terms at a time as they are merged
+            terms = list(term_ids)
+            token_counts = np.array(token_counts, dtype=np.int64)
+            for i, (block_terms, docs, positions) in enumerate(blocks):
+                self._build_postings(terms, block_terms, docs, positions, token_counts, doc_count,
+                                     train_clib=i == 0)
+        
+        self._reset_query_state()
         
         # Save index using datastore strategy
         self._save_index(index_id)
         
         print(f"Index created with {len(self.index)} terms and {doc_count} documents")
     
-    def _add_skip_pointers(self, postings: List) -> List:
-        """Add skip pointers to postings (every sqrt(n) entries)."""
-        n = len(postings)
-        skip_distance = int(math.sqrt(n)) if n > 0 else 1
+    def _build_postings(self, terms: List[str], term_ids: np.ndarray, docs: np.ndarray,
+                        positions: np.ndarray, token_counts: np.ndarray, doc_count: int,
+                        train_clib: bool = False) -> None:
+        """Build, compress and store the postings of a block of whole terms.
         
-        postings_with_skips = []
-        for i, posting in enumerate(postings):
-            skip_to = i + skip_distance if i + skip_distance < n else None
-            postings_with_skips.append((posting, skip_to))
+        Args:
+            terms: Term string of every term id
+            term_ids, docs, positions: Term id, doc id and position of each
+                occurrence, sorted by (term, doc, position)
+            token_counts: Token count of every document, for TF
+            train_clib: Train the CLIB dictionary on this block before compressing
+        """
+        # One posting per run of equal (term, doc), one term per run of equal term
+        new_posting = np.ones(len(term_ids), dtype=bool)
+        new_posting[1:] = (term_ids[1:] != term_ids[:-1]) | (docs[1:] != docs[:-1])
+        posting_starts = np.flatnonzero(new_posting)
+        doc_ids = docs[posting_starts]
+        counts = np.diff(np.append(posting_starts, len(docs))).astype(np.int32)
         
-        return postings_with_skips
+        posting_terms = term_ids[posting_starts]
+        new_term = np.ones(len(posting_terms), dtype=bool)
+        new_term[1:] = posting_terms[1:] != posting_terms[:-1]
+        term_starts = np.flatnonzero(new_term)
+        df = np.diff(np.append(term_starts, len(posting_starts)))
+        block_terms = [terms[term_id] for term_id in posting_terms[term_starts].tolist()]
+        
+        if self.info_strategy == IndexInfo.BOOLEAN:
+            # x=1: (doc_id, [positions])
+            scores = None
+        
+        elif self.info_strategy == IndexInfo.WORDCOUNT:
+            # x=2: (doc_id, term_count, [positions])
+            scores = counts
+        
+        elif self.info_strategy == IndexInfo.TFIDF:
+            # x=3: (doc_id, tf * idf, [positions]), for every posting of the block at once
+            idf = np.log(doc_count / df)
+            self.idf_scores.update(zip(block_terms, idf.tolist()))
+            scores = counts / token_counts[doc_ids] * np.repeat(idf, df)
+        
+        # Posting and occurrence ranges of each term
+        posting_bounds = np.append(term_starts, len(posting_starts)).tolist()
+        position_bounds = np.append(posting_starts[term_starts], len(docs)).tolist()
+        
+        block_postings = []
+        for i in range(len(block_terms)):
+            p0, p1 = posting_bounds[i], posting_bounds[i + 1]
+            block_postings.append(ColumnarPostings(
+                doc_ids[p0:p1], None if scores is None else scores[p0:p1],
+                counts[p0:p1], positions[position_bounds[i]:position_bounds[i + 1]]))
+        
+        if train_clib:
+            self._train_clib_dictionary(block_postings)
+        
+        # Apply compression (z=n). Skip pointers (i=1) are fixed by the list
+        # length, so they are laid out when postings are decoded
+        for term, postings in zip(block_terms, block_postings):
+            self.index[term] = self._compress_postings(postings)
     
-    def _compress_postings(self, postings: List) -> bytes:
-        """Compress postings based on compression strategy."""
-        if self.compression_strategy == Compression.NONE:
-            return pickle.dumps(postings)
+    @classmethod
+    def clone_from(cls, base: 'MySelfIndex', index_id: str, core, info, dstore, qproc,
+                   compr, optim) -> 'MySelfIndex':
+        """Build a variant of an already built index without re-tokenizing the documents.
         
-        # Extract doc_ids for gap encoding
-        if self.optim_strategy == Optimizations.Skipping:
-            doc_ids = [p[0][0] for p in postings]
-        else:
-            doc_ids = [p[0] for p in postings]
+        The base postings are decoded and re-encoded with the variant's skip pointer
+        and compression strategies, then saved under the variant's own directory.
+        
+        Args:
+            base: Built index sharing the same index info strategy
+            index_id: The unique identifier for the new index
+        """
+        clone = cls(core, info, dstore, qproc, compr, optim)
+        if clone.info_strategy != base.info_strategy:
+            raise ValueError(f"Cannot clone {clone.identifier_short} from {base.identifier_short}: "
+                             f"index info differs")
+        
+        print(f"Cloning index {index_id} with configuration {clone.identifier_short} "
+              f"from {base.identifier_short}")
         
-        # Gap encoding
-        gaps = [doc_ids[0]] if doc_ids else []
-        for i in range(1, len(doc_ids)):
-            # Simple numeric difference (assuming doc_ids can be converted)
-            gaps.append(doc_ids[i])
+        clone.doc_ids = base.doc_ids
+        clone.doc_lengths = base.doc_lengths
+        clone.idf_scores = base.idf_scores
+        clone.total_docs = base.total_docs
+        clone.indexed_files = set(base.indexed_files)
         
-        if self.compression_strategy == Compression.CODE:
-            # z=1: Variable-byte encoding
+        sample_terms = _evenly_spaced(list(base.index), _ZSTD_SAMPLES)
+        clone._train_clib_dictionary([base._decompress_postings(base.index[term]) for term in sample_terms])
+        
+        for term, compressed_postings in base.index.items():
+            postings = base._decompress_postings(compressed_postings)
+            clone.index[term] = clone._compress_postings(postings)
+        
+        clone._save_index(index_id)
+        return clone
+    
+    def _compress_postings(self, postings) -> bytes:
+        """Compress postings based on compression strategy.
+        
+        Args:
+            postings: Tuple postings sorted by doc id (without skip pointers),
+                or decoded ColumnarPostings
+        """
+        if not isinstance(postings, ColumnarPostings):
+            postings = ColumnarPostings.from_postings(postings)
+        
+        if self.compression_strategy == Compression.NONE:
+            # z=0: Raw columnar bytes
+            return postings.to_bytes()
+        
+        elif self.compression_strategy == Compression.CODE:
+            # z=1: Stream VByte encoding of gaps
             return self._vbyte_encode(postings)
         
         elif self.compression_strategy == Compression.CLIB:
-            # z=2: Use zlib compression
-            serialized = pickle.dumps(postings)
-            return zlib.compress(serialized)
+            # z=2: zstd with a dictionary trained on this index's postings, or zlib.
+            # Long position lists are a separate frame, only decompressed for
+            # phrase queries; a zero frame length marks a single frame
+            positions = postings.positions.astype(np.int32).tobytes()
+            if len(positions) < _CLIB_SPLIT_BYTES:
+                return struct.pack('<I', 0) + self._clib_compress(postings.to_bytes())
+            columns = self._clib_compress(postings.columns_to_bytes())
+            return struct.pack('<I', len(columns)) + columns + self._clib_compress(positions)
         
-        return pickle.dumps(postings)
+        return postings.to_bytes()
+    
+    def _set_clib_codec(self, codec: str, dict_data: Optional[bytes] = None) -> None:
+        """Select the CLIB codec ('zstd' or 'zlib') and the zstd dictionary it uses."""
+        self.clib_codec = codec
+        self._zstd_dict = dict_data
+        if codec == 'zstd':
+            zdict = zstandard.ZstdCompressionDict(dict_data) if dict_data else None
+            # Every frame uses the index's dictionary, so frames need not name it
+            self._zstd_compressor = zstandard.ZstdCompressor(level=_ZSTD_LEVEL, dict_data=zdict,
+                                                             write_dict_id=False)
+            self._zstd_decompressor = zstandard.ZstdDecompressor(dict_data=zdict)
+    
+    def _clib_compress(self, data: bytes) -> bytes:
+        """Compress one CLIB frame with the index's codec."""
+        if self.clib_codec == 'zstd':
+            return self._zstd_compressor.compress(data)
+        return zlib.compress(data)
     
-    def _vbyte_encode(self, postings: List) -> bytes:
-        """Simple variable-byte encoding."""
-        # For simplicity, just use pickle with a marker
-        return b'VBYTE:' + pickle.dumps(postings)
+    def _clib_decompress(self, frame) -> bytes:
+        """Decompress one CLIB frame written by _clib_compress."""
+        if self.clib_codec == 'zstd':
+            return self._zstd_decompressor.decompress(frame)
+        return zlib.decompress(frame)
     
-    def _decompress_postings(self, compressed: bytes) -> List:
+    def _train_clib_dictionary(self, postings: Sequence[ColumnarPostings]) -> None:
+        """Train the zstd dictionary for CLIB postings on an even sample of postings lists."""
+        if self.compression_strategy != Compression.CLIB or zstandard is None:
+            return
+        
+        samples = []
+        for sample in _evenly_spaced(postings, _ZSTD_SAMPLES):
+            samples.append(sample.columns_to_bytes())
+            samples.append(sample.positions.astype(np.int32).tobytes())
+        try:
+            dict_data = zstandard.train_dictionary(_ZSTD_DICT_SIZE, samples).as_bytes()
+        except zstandard.ZstdError:
+            # Too little sample data to train on; compress without a dictionary
+            dict_data = None
+        self._set_clib_codec('zstd', dict_data)
+    
+    def _metadata(self) -> Dict:
+        """Index metadata stored next to the postings."""
+        return {
+            'doc_ids': self.doc_ids,
+            'doc_lengths': self.doc_lengths,
+            'idf_scores': self.idf_scores,
+            'total_docs': self.total_docs,
+            'indexed_files': list(self.indexed_files),
+            'clib_codec': self.clib_codec,
+            'zstd_dict': self._zstd_dict
+        }
+    
+    def _load_metadata(self, meta: Dict) -> None:
+        """Restore index metadata written by _metadata."""
+        self.doc_ids = meta['doc_ids']
+        self.doc_lengths = meta['doc_lengths']
+        self.idf_scores = meta['idf_scores']
+        self.total_docs = meta['total_docs']
+        self.indexed_files = set(meta['indexed_files'])
+        
+        codec = meta.get('clib_codec', 'zlib')
+        if codec == 'zstd' and zstandard is None:
+            raise ImportError("Index postings are zstd-compressed; install zstandard to load it")
+        self._set_clib_codec(codec, meta.get('zstd_dict'))
+    
+    def _vbyte_encode(self, postings: ColumnarPostings) -> bytes:
+        """Stream VByte encode postings sorted by doc id.
+        
+        Layout: posting count, doc block value count, doc bitmap length and doc
+        block length (uint32 each), 8-bit quantized TF-IDF scores (TFIDF only),
+        the doc bitmap, a Stream VByte block of doc id gaps (when there is no
+        bitmap) and position counts, then a Stream VByte block of position gaps.
+        Term counts are not stored since they equal the position counts.
+        Positions come last so decoding can leave them for phrase queries.
+        """
+        counts = postings.counts.astype(np.int64)
+        positions = postings.positions.astype(np.int64)
+        doc_ids = postings.doc_ids.astype(np.int64)
+        
+        # Gap-encode positions within each posting; a posting's first position stays absolute
+        position_gaps = np.diff(positions, prepend=0)
+        starts = np.cumsum(counts)[:-1]
+        position_gaps[starts] = positions[starts]
+        
+        # Terms in at least one of every 8 docs up to their last one store doc ids
+        # as a bitmap, never larger than one byte per doc gap
+        if len(doc_ids) and (doc_ids[-1] >> 3) + 1 <= len(doc_ids):
+            bits = np.zeros(doc_ids[-1] + 1, dtype=bool)
+            bits[doc_ids] = True
+            bitmap = np.packbits(bits, bitorder='little').tobytes()
+            values = counts
+        else:
+            bitmap = b''
+            values = np.concatenate((np.diff(doc_ids, prepend=0), counts))
+        doc_block = streamvbyte_encode(values)
+        
+        header = struct.pack('<IIII', len(postings), len(values), len(bitmap), len(doc_block))
+        if self.info_strategy == IndexInfo.TFIDF:
+            header += quantize_scores(postings.scores)
+        return header + bitmap + doc_block + streamvbyte_encode(position_gaps)
+    
+    def _vbyte_decode(self, compressed: bytes) -> ColumnarPostings:
+        """Decode postings written by _vbyte_encode."""
+        n, value_count, bitmap_len, doc_block_len = struct.unpack_from('<IIII', compressed)
+        offset = 16
+        if self.info_strategy == IndexInfo.TFIDF:
+            scores = dequantize_scores(compressed, n, offset)
+            offset += 4 + n
+        
+        if bitmap_len:
+            bitmap = np.frombuffer(compressed, dtype=np.uint8, count=bitmap_len, offset=offset)
+            doc_ids = np.flatnonzero(np.unpackbits(bitmap, bitorder='little')).astype(np.int32)
+            offset += bitmap_len
+            values = streamvbyte_decode(memoryview(compressed)[offset:], value_count)
+        else:
+            values = streamvbyte_decode(memoryview(compressed)[offset:], value_count)
+            doc_ids = np.cumsum(values[:n]).astype(np.int32)
+            values = values[n:]
+        counts = values.astype(np.int32)
+        offset += doc_block_len
+        
+        def decode_positions() -> np.ndarray:
+            # Prefix-sum all position gaps at once, then rebase each posting on its own start
+            ends = np.cumsum(counts)
+            position_sums = np.cumsum(streamvbyte_decode(memoryview(compressed)[offset:], int(ends[-1]) if n else 0))
+            bases = np.concatenate(([0], position_sums[ends[:-1] - 1])) if n else ends
+            return (position_sums - np.repeat(bases, counts)).astype(np.int32)
+        
+        if self.info_strategy == IndexInfo.BOOLEAN:
+            scores = None
+        elif self.info_strategy == IndexInfo.WORDCOUNT:
+            scores = counts
+        
+        return ColumnarPostings(doc_ids, scores, counts, decode_positions,
+                                self.optim_strategy == Optimizations.Skipping)
+    
+    def _reset_query_state(self):
+        """Drop cached postings, results and the query engine after self.index changes."""
+        self._get_postings.cache_clear()
+        if self._cached_query is not None:
+            self._cached_query.cache_clear()
+        self._engine = None
+    
+    def _decode_term(self, term: str) -> List:
+        """Decode one term's postings (uncached, see _get_postings)."""
+        return self._decompress_postings(self.index[term])
+    
+    def _decompress_postings(self, compressed: bytes) -> ColumnarPostings:
         """Decompress postings."""
+        skips = self.optim_strategy == Optimizations.Skipping
+        
         if self.compression_strategy == Compression.NONE:
-            return pickle.loads(compressed)
+            return ColumnarPostings.from_bytes(compressed, skips)
         
         elif self.compression_strategy == Compression.CODE:
-            # Remove VBYTE marker
-            if compressed.startswith(b'VBYTE:'):
-                return pickle.loads(compressed[6:])
-            return pickle.loads(compressed)
+            return self._vbyte_decode(compressed)
         
         elif self.compression_strategy == Compression.CLIB:
-            decompressed = zlib.decompress(compressed)
-            return pickle.loads(decompressed)
+            columns_len, = struct.unpack_from('<I', compressed)
+            if not columns_len:
+                return ColumnarPostings.from_bytes(self._clib_decompress(memoryview(compressed)[4:]), skips)
+            columns = self._clib_decompress(memoryview(compressed)[4:4 + columns_len])
+            positions = memoryview(compressed)[4 + columns_len:]
+            return ColumnarPostings.from_bytes(
+                columns, skips, lambda: np.frombuffer(self._clib_decompress(positions), dtype=np.int32))
         
-        return pickle.loads(compressed)
+        return ColumnarPostings.from_bytes(compressed, skips)
+    
+    def index_path(self, index_id: str) -> Path:
+        """Path to pass to load_index for an index saved under index_id."""
+        if self.datastore_strategy == DataStore.DB1:
+            return self.base_dir / f"{index_id}_sqlite.db"
+        return self.base_dir / f"{index_id}_index.bin"
     
     def _save_index(self, index_id: str):
         """Save index based on datastore strategy."""
         if self.datastore_strategy == DataStore.CUSTOM:
-            # y=1: Save using pickle
-            index_file = self.base_dir / f"{index_id}_index.pkl"
+            # y=1: Packed term dictionary file, metadata pickle
+            index_file = self.index_path(index_id)
             meta_file = self.base_dir / f"{index_id}_meta.pkl"
             
-            with open(index_file, 'wb') as f:
-                pickle.dump(self.index, f)
+            TermDictionary.write(index_file, self.index)
             
             with open(meta_file, 'wb') as f:
-                pickle.dump({
-                    'doc_lengths': self.doc_lengths,
-                    'idf_scores': self.idf_scores,
-                    'total_docs': self.total_docs,
-                    'indexed_files': list(self.indexed_files)
-                }, f)
+                pickle.dump(self._metadata(), f, pickle.HIGHEST_PROTOCOL)
         
         elif self.datastore_strategy == DataStore.DB1:
             # y=2: SQLite
-            db_path = self.base_dir / f"{index_id}_sqlite.db"
-            conn = sqlite3.connect(str(db_path))
+            db_path = self.index_path(index_id)
+            dat_path = self.base_dir / f"{index_id}_postings.dat"
+            conn = self._db(db_path)
             cursor = conn.cursor()
             
-            # Create tables
+            # Recreate tables, so a database written with an older schema or
+            # vocabulary never leaves stale columns or rows behind
+            cursor.execute('DROP TABLE IF EXISTS inverted_index')
+            cursor.execute('DROP TABLE IF EXISTS metadata')
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS inverted_index (
+                CREATE TABLE inverted_index (
                     term TEXT PRIMARY KEY,
-                    postings BLOB
+                    postings BLOB,
+                    ext_off INTEGER,
+                    ext_len INTEGER
                 )
             ''')
             
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS metadata (
+                CREATE TABLE metadata (
                     key TEXT PRIMARY KEY,
                     value BLOB
                 )
             ''')
             
-            # Insert index data
-            for term, postings in self.index.items():
-                # Serialize postings if it's not already bytes
-                if isinstance(postings, bytes):
-                    postings_blob = postings
-                else:
-                    postings_blob = pickle.dumps(postings)
+            meta = self._metadata()
+            
+            # Insert index data in one transaction with a single prepared statement;
+            # large blobs are written to the postings file and stored by offset/length
+            with conn, open(dat_path, 'wb') as dat_file:
+                cursor.executemany(
+                    'INSERT OR REPLACE INTO inverted_index (term, postings, ext_off, ext_len) '
+                    'VALUES (?, ?, ?, ?)',
+                    _sqlite_rows(self.index, dat_file)
+                )
                 
+                # Insert metadata
                 cursor.execute(
-                    'INSERT OR REPLACE INTO inverted_index (term, postings) VALUES (?, ?)',
-                    (term, postings_blob)
+                    'INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)',
+                    ('metadata', pickle.dumps(meta, pickle.HIGHEST_PROTOCOL))
                 )
-            
-            # Insert metadata
-            meta = {
-                'doc_lengths': self.doc_lengths,
-                'idf_scores': self.idf_scores,
-                'total_docs': self.total_docs,
-                'indexed_files': list(self.indexed_files)
-            }
-            cursor.execute(
-                'INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)',
-                ('metadata', pickle.dumps(meta))
-            )
-            
-            conn.commit()
-            conn.close()
         
         elif self.datastore_strategy == DataStore.DB2:
             # y=3: PostgreSQL - simplified version saves to file
@@ -248,18 +707,15 @@ class MySelfIndex(IndexBase):
     def load_index(self, serialized_index_dump: str) -> None:
         """Load index from disk."""
         index_path = Path(serialized_index_dump)
+        self._reset_query_state()
         
         if self.datastore_strategy == DataStore.CUSTOM:
-            with open(index_path, 'rb') as f:
-                self.index = pickle.load(f)
+            # Maps the file; terms are looked up in place rather than unpickled
+            self.index = TermDictionary.load(index_path)
             
-            meta_file = index_path.parent / index_path.name.replace('_index.pkl', '_meta.pkl')
+            meta_file = index_path.parent / index_path.name.replace('_index.bin', '_meta.pkl')
             with open(meta_file, 'rb') as f:
-                meta = pickle.load(f)
-                self.doc_lengths = meta['doc_lengths']
-                self.idf_scores = meta['idf_scores']
-                self.total_docs = meta['total_docs']
-                self.indexed_files = set(meta['indexed_files'])
+                self._load_metadata(pickle.load(f))
         
         elif self.datastore_strategy == DataStore.DB1:
             # y=2: SQLite
@@ -268,60 +724,69 @@ class MySelfIndex(IndexBase):
                 # If path doesn't end with .db, try to find it
                 db_path = index_path.parent / f"{index_path.stem}_sqlite.db"
             
-            conn = sqlite3.connect(str(db_path))
-            cursor = conn.cursor()
+            cursor = self._db(db_path).cursor()
+            
+            # Load index data. Large postings stay in the mmapped postings file
+            # and are only paged in when a query decodes them
+            dat_path = db_path.parent / db_path.name.replace('_sqlite.db', '_postings.dat')
+            postings_view = None
+            self._postings_map = None
             
-            # Load index data
-            cursor.execute('SELECT term, postings FROM inverted_index')
+            cursor.execute('SELECT term, postings, ext_off, ext_len FROM inverted_index')
             self.index = {}
-            for term, postings in cursor.fetchall():
+            for term, postings, ext_off, ext_len in cursor:
+                if postings is None:
+                    if postings_view is None:
+                        with open(dat_path, 'rb') as f:
+                            self._postings_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                        postings_view = memoryview(self._postings_map)
+                    postings = postings_view[ext_off:ext_off + ext_len]
                 self.index[term] = postings
             
             # Load metadata
             cursor.execute('SELECT value FROM metadata WHERE key = ?', ('metadata',))
             meta_row = cursor.fetchone()
             if meta_row:
-                meta = pickle.loads(meta_row[0])
-                self.doc_lengths = meta['doc_lengths']
-                self.idf_scores = meta['idf_scores']
-                self.total_docs = meta['total_docs']
-                self.indexed_files = set(meta['indexed_files'])
-            
-            conn.close()
+                self._load_metadata(pickle.loads(meta_row[0]))
 
     def query(self, query: str) -> str:
         """Execute query and return results."""
-        # Parse query
-        query_ast = self.query_parser.parse(query)
-        
-        # Create a decompressed view of the index for query engine
-        decompressed_index = {}
-        for term, compressed_postings in self.index.items():
-            if term == '__all_docs__':
-                decompressed_index[term] = compressed_postings
-            else:
-                decompressed_index[term] = self._decompress_postings(compressed_postings)
+        if self._cached_query is not None:
+            return self._cached_query(query)
+        return self._run_query(query)
+    
+    def _run_query(self, query: str) -> str:
+        """Evaluate query against the index (uncached, see query)."""
+        # Parse query (QueryParser caches trees, the benchmark replays the same query strings)
+        query_ast = _QUERY_PARSER.parse(query)
         
-        # Execute based on query processing strategy
-        engine = QueryEngine(decompressed_index, self.total_docs, 
-                           self.optim_strategy == Optimizations.Skipping)
+        # Execute based on query processing strategy; postings are decoded
+        # lazily per term and the engine is kept across queries
+        if self._engine is None:
+            self._engine = QueryEngine(_PostingsView(self), self.total_docs, 
+                                       self.optim_strategy == Optimizations.Skipping)
         
         mode = 'TAAT' if self.qproc_strategy == QueryProc.TERMatat else 'DAAT'
-        results = engine.execute(query_ast, mode=mode)
+        results = self._engine.execute(query_ast, mode=mode, k=_MAX_RESULTS)
         
-        # Format results as JSON
-        result_list = [{'doc_id': doc_id, 'score': score} for doc_id, score in results[:100]]
-        return json.dumps(result_list, indent=2)
+        # Format results as compact JSON, mapping integer ids back to doc_id strings
+        doc_ids = self.doc_ids
+        result_list = [{'doc_id': doc_ids[doc_int], 'score': score} for doc_int, score in results]
+        if orjson is not None:
+            return orjson.dumps(result_list).decode()
+        return json.dumps(result_list, separators=(',', ':'))
     
     def update_index(self, index_id: str, remove_files: Iterable[Tuple[str, str]], 
                     add_files: Iterable[Tuple[str, str]]) -> None:
         """Update existing index."""
         # For simplicity, rebuild the index
+        self._reset_query_state()
         print("Update not fully implemented, consider rebuilding")
     
     def delete_index(self, index_id: str) -> None:
         """Delete index files."""
         import shutil
+        self._close_db()
         if self.base_dir.exists():
             shutil.rmtree(self.base_dir)
     
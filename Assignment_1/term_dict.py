@@ -0,0 +1,109 @@
+import bisect
+import mmap
+import os
+import struct
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+import numpy as np
+
+# Header: term count, term blob length. Followed by the term offsets and
+# postings offsets (int64, count + 1 each), the term blob and the postings blob
+_HEADER = struct.Struct('<QQ')
+
+class _TermKeys(Sequence):
+    """Sorted UTF-8 term keys, sliced out of the term blob on access."""
+    
+    __slots__ = ('blob', 'offsets')
+    
+    def __init__(self, blob: memoryview, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+    
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+    
+    def __getitem__(self, i: int) -> bytes:
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]])
+
+class TermDictionary(Mapping):
+    """Read-only term -> postings blob mapping over a single packed index file.
+    
+    Terms are stored sorted in one blob with an offsets array, and the postings
+    blobs back to back with a second offsets array, so opening an index maps the
+    file instead of unpickling one object per term. Lookups binary search the
+    term offsets and return zero-copy memoryview slices of the postings.
+    """
+    
+    def __init__(self, buf):
+        """
+        Args:
+            buf: Buffer written by TermDictionary.write (usually an mmap)
+        """
+        n, term_len = _HEADER.unpack_from(buf)
+        offset = _HEADER.size
+        
+        term_off = np.frombuffer(buf, dtype=np.int64, count=n + 1, offset=offset)
+        offset += 8 * (n + 1)
+        self._post_off = np.frombuffer(buf, dtype=np.int64, count=n + 1, offset=offset)
+        offset += 8 * (n + 1)
+        
+        view = memoryview(buf)
+        self._keys = _TermKeys(view[offset:offset + term_len], term_off)
+        self._postings = view[offset + term_len:]
+        self._buf = buf
+    
+    @classmethod
+    def load(cls, path: Path) -> 'TermDictionary':
+        """Map an index file written by write."""
+        with open(path, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    
+    @staticmethod
+    def write(path: Path, index: Mapping) -> None:
+        """Write a term -> postings blob mapping as a packed index file.
+        
+        The file is replaced atomically, so an index mapped from path stays valid.
+        """
+        # UTF-8 preserves code point order, so str sorting matches the byte order lookups use
+        terms = sorted(index)
+        keys = [term.encode() for term in terms]
+        blobs = [index[term] for term in terms]
+        
+        term_off = np.zeros(len(terms) + 1, dtype=np.int64)
+        term_off[1:] = np.cumsum([len(key) for key in keys])
+        post_off = np.zeros(len(terms) + 1, dtype=np.int64)
+        post_off[1:] = np.cumsum([len(blob) for blob in blobs])
+        
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(len(terms), int(term_off[-1])))
+            f.write(term_off.tobytes())
+            f.write(post_off.tobytes())
+            f.write(b''.join(keys))
+            f.writelines(blobs)
+        os.replace(tmp_path, path)
+    
+    def _find(self, term) -> int:
+        """Position of term in the sorted keys, or -1."""
+        if not isinstance(term, str):
+            return -1
+        key = term.encode()
+        i = bisect.bisect_left(self._keys, key)
+        return i if i < len(self._keys) and self._keys[i] == key else -1
+    
+    def __getitem__(self, term: str) -> memoryview:
+        i = self._find(term)
+        if i < 0:
+            raise KeyError(term)
+        return self._postings[self._post_off[i]:self._post_off[i + 1]]
+    
+    def __contains__(self, term) -> bool:
+        return self._find(term) >= 0
+    
+    def __iter__(self):
+        keys = self._keys
+        for i in range(len(keys)):
+            yield keys[i].decode()
+    
+    def __len__(self) -> int:
+        return len(self._keys)
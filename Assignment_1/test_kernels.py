@@ -0,0 +1,58 @@
+"""
+Tests for the numeric kernels: Stream VByte coding and sorted intersection.
+"""
+import unittest
+import numpy as np
+from _kernels import streamvbyte_encode, streamvbyte_decode, intersect_sorted
+
+class TestStreamVByte(unittest.TestCase):
+    """Stream VByte encode / decode."""
+    
+    def assert_round_trip(self, values):
+        values = np.asarray(values, dtype=np.int64)
+        decoded = streamvbyte_decode(streamvbyte_encode(values), len(values))
+        self.assertEqual(decoded.dtype, np.int64)
+        np.testing.assert_array_equal(decoded, values)
+    
+    def test_round_trip(self):
+        rng = np.random.default_rng(0)
+        for n in range(0, 10):
+            self.assert_round_trip(rng.integers(0, 2 ** 32, n))
+        for high in (2 ** 8, 2 ** 16, 2 ** 24, 2 ** 32):
+            self.assert_round_trip(rng.integers(0, high, 1001))
+    
+    def test_length_boundaries(self):
+        # Every 1-4 byte length, at the edges of each
+        self.assert_round_trip([0, 0xFF, 0x100, 0xFFFF, 0x10000, 0xFFFFFF, 0x1000000, 0xFFFFFFFF])
+    
+    def test_layout(self):
+        # One control byte per four values (length - 1 in two bits each,
+        # lowest bits first), then each value's little-endian bytes
+        buf = streamvbyte_encode(np.array([1, 0x1234, 0x123456, 0x12345678, 7]))
+        self.assertEqual(buf[:2], bytes([0b11100100, 0b00000000]))
+        self.assertEqual(buf[2:], bytes([0x01, 0x34, 0x12, 0x56, 0x34, 0x12,
+                                         0x78, 0x56, 0x34, 0x12, 0x07]))
+        self.assertEqual(len(streamvbyte_encode(np.zeros(0, dtype=np.int64))), 0)
+    
+    def test_decode_ignores_trailing_bytes(self):
+        values = np.array([300, 5, 70000], dtype=np.int64)
+        buf = streamvbyte_encode(values) + streamvbyte_encode(np.array([9, 9]))
+        np.testing.assert_array_equal(streamvbyte_decode(buf, 3), values)
+        np.testing.assert_array_equal(streamvbyte_decode(memoryview(buf), 3), values)
+
+class TestIntersectSorted(unittest.TestCase):
+    """Sorted doc id intersection, with and without skips."""
+    
+    def test_matches_set_intersection(self):
+        rng = np.random.default_rng(1)
+        for _ in range(200):
+            n = int(rng.choice([10, 1000, 100000]))
+            a = np.sort(rng.choice(n, rng.integers(0, min(n, 500)), replace=False)).astype(np.int32)
+            b = np.sort(rng.choice(n, rng.integers(0, min(n, 5000)), replace=False)).astype(np.int32)
+            expected = sorted(set(a.tolist()) & set(b.tolist()))
+            for use_skips in (False, True):
+                self.assertEqual(intersect_sorted(a, b, use_skips).tolist(), expected)
+                self.assertEqual(intersect_sorted(b, a, use_skips).tolist(), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+"""
+Tests for the columnar postings format and its byte serialization.
+"""
+import unittest
+import numpy as np
+from postings import ColumnarPostings, quantize_scores, dequantize_scores
+
+def _tuple_postings(rng: np.random.Generator, n: int, kind: str):
+    """Random tuple postings as MySelfIndex builds them, sorted by doc id."""
+    doc_ids = np.sort(rng.choice(10 ** 6, n, replace=False)).tolist()
+    postings = []
+    for doc_id in doc_ids:
+        positions = np.sort(rng.choice(10 ** 5, rng.integers(1, 20), replace=False)).tolist()
+        if kind == 'boolean':
+            postings.append((doc_id, positions))
+        elif kind == 'count':
+            postings.append((doc_id, len(positions), positions))
+        else:
+            postings.append((doc_id, float(rng.exponential(2.0)), positions))
+    return postings
+
+class TestQuantizedScores(unittest.TestCase):
+    """8-bit score quantization."""
+    
+    def test_error_within_half_step(self):
+        rng = np.random.default_rng(0)
+        for scale in (1e-3, 1.0, 1e3):
+            scores = rng.exponential(scale, 500)
+            decoded = dequantize_scores(quantize_scores(scores), len(scores))
+            self.assertEqual(decoded.dtype, np.float64)
+            # Half a quantization step, plus float32 rounding of the scale
+            self.assertLessEqual(np.abs(decoded - scores).max(), scores.max() / 255 / 2 * 1.0001)
+    
+    def test_max_score_is_exact_up_to_float32(self):
+        scores = np.array([0.1, 2.5, 7.25, 3.0])
+        decoded = dequantize_scores(quantize_scores(scores), len(scores))
+        self.assertAlmostEqual(decoded.max(), 7.25, places=5)
+    
+    def test_zero_and_empty_scores(self):
+        zeros = np.zeros(3)
+        np.testing.assert_array_equal(dequantize_scores(quantize_scores(zeros), 3), zeros)
+        self.assertEqual(len(dequantize_scores(quantize_scores(np.zeros(0)), 0)), 0)
+    
+    def test_offset(self):
+        scores = np.array([1.0, 2.0, 4.0])
+        buf = b'\x00' * 7 + quantize_scores(scores)
+        np.testing.assert_allclose(dequantize_scores(buf, 3, offset=7), scores, atol=4 / 255 / 2 * 1.0001)
+
+class TestColumnarPostingsBytes(unittest.TestCase):
+    """to_bytes / from_bytes round trips."""
+    
+    def setUp(self):
+        self.rng = np.random.default_rng(1)
+    
+    def assert_round_trip(self, postings, decoded):
+        """Check decoded matches tuple postings, allowing quantization error in float scores."""
+        self.assertEqual(len(decoded), len(postings))
+        if postings and isinstance(postings[0][1], float):
+            top = max(p[1] for p in postings)
+            self.assertEqual([(p[0], p[2]) for p in decoded], [(p[0], p[2]) for p in postings])
+            for got, expected in zip(decoded, postings):
+                self.assertAlmostEqual(got[1], expected[1], delta=top / 255 / 2 * 1.0001)
+        else:
+            self.assertEqual(list(decoded), postings)
+    
+    def test_round_trip(self):
+        for kind in ('boolean', 'count', 'tfidf'):
+            for n in (1, 2, 37, 400):
+                with self.subTest(kind=kind, n=n):
+                    postings = _tuple_postings(self.rng, n, kind)
+                    buf = ColumnarPostings.from_postings(postings).to_bytes()
+                    self.assert_round_trip(postings, ColumnarPostings.from_bytes(buf))
+    
+    def test_round_trip_columns(self):
+        postings = _tuple_postings(self.rng, 50, 'count')
+        original = ColumnarPostings.from_postings(postings)
+        decoded = ColumnarPostings.from_bytes(original.to_bytes())
+        
+        np.testing.assert_array_equal(decoded.doc_ids, original.doc_ids)
+        np.testing.assert_array_equal(decoded.counts, original.counts)
+        np.testing.assert_array_equal(decoded.positions, original.positions)
+        # Term counts are not stored twice, the score column is the count column
+        self.assertIs(decoded.scores, decoded.counts)
+    
+    def test_quantized_scores_are_stable(self):
+        postings = _tuple_postings(self.rng, 100, 'tfidf')
+        once = ColumnarPostings.from_bytes(ColumnarPostings.from_postings(postings).to_bytes())
+        twice = ColumnarPostings.from_bytes(once.to_bytes())
+        
+        # Requantizing decoded scores reproduces the same codes
+        self.assertEqual(twice.to_bytes(), once.to_bytes())
+        self.assertEqual(once.max_score(), float(once.scores.max()))
+    
+    def test_empty(self):
+        for scores in (None, np.zeros(0, dtype=np.int32), np.zeros(0)):
+            empty = ColumnarPostings(np.zeros(0, dtype=np.int32), scores, np.zeros(0, dtype=np.int32),
+                                     np.zeros(0, dtype=np.int32))
+            decoded = ColumnarPostings.from_bytes(empty.to_bytes())
+            self.assertEqual(len(decoded), 0)
+            self.assertEqual(list(decoded), [])
+    
+    def test_lazy_positions(self):
+        postings = _tuple_postings(self.rng, 30, 'count')
+        original = ColumnarPostings.from_postings(postings)
+        position_bytes = original.positions.astype(np.int32).tobytes()
+        
+        calls = []
+        def load_positions():
+            calls.append(1)
+            return np.frombuffer(position_bytes, dtype=np.int32)
+        
+        decoded = ColumnarPostings.from_bytes(original.columns_to_bytes(), positions=load_positions)
+        
+        # Columns are usable without decoding the positions
+        np.testing.assert_array_equal(decoded.doc_ids, original.doc_ids)
+        self.assertEqual(decoded.max_score(), float(original.counts.max()))
+        self.assertEqual(calls, [])
+        
+        # Positions are decoded once, on first access
+        self.assertEqual(list(decoded), postings)
+        np.testing.assert_array_equal(decoded.occurrences()[1], original.positions)
+        self.assertEqual(calls, [1])
+    
+    def test_positions_array(self):
+        postings = _tuple_postings(self.rng, 10, 'boolean')
+        original = ColumnarPostings.from_postings(postings)
+        decoded = ColumnarPostings.from_bytes(original.columns_to_bytes(), positions=original.positions)
+        self.assertEqual(list(decoded), postings)
+    
+    def test_skips(self):
+        postings = _tuple_postings(self.rng, 17, 'count')
+        decoded = ColumnarPostings.from_bytes(ColumnarPostings.from_postings(postings).to_bytes(), skips=True)
+        
+        # Skip pointers every sqrt(17) = 4 entries, none past the end
+        self.assertEqual([posting for posting, _ in decoded], postings)
+        self.assertEqual([skip for _, skip in decoded], [i + 4 if i + 4 < 17 else None for i in range(17)])
+    
+    def test_occurrences(self):
+        postings = [(3, 2, [1, 5]), (8, 1, [0]), (9, 3, [2, 4, 6])]
+        docs, positions = ColumnarPostings.from_postings(postings).occurrences()
+        np.testing.assert_array_equal(docs, [3, 3, 8, 9, 9, 9])
+        np.testing.assert_array_equal(positions, [1, 5, 0, 2, 4, 6])
+
+if __name__ == '__main__':
+    unittest.main()
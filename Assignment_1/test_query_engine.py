@@ -0,0 +1,251 @@
+"""
+Tests for query evaluation against brute-force references.
+"""
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import tempfile
+import unittest
+from collections import defaultdict
+import numpy as np
+from postings import ColumnarPostings, quantize_scores, dequantize_scores
+from preprocess import preprocess
+from query_engine import QueryEngine
+from query_parser import QueryParser, TermNode, PhraseNode, NotNode, AndNode, OrNode
+from self_index import MySelfIndex, _MAX_RESULTS
+
+# Query words are already stems; frequencies span rare terms to ones in most documents
+VOCAB = ['alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'theta', 'kappa']
+WEIGHTS = [40, 15, 8, 4, 2, 1, 0.3, 0.1]
+
+def setUpModule():
+    # MySelfIndex keeps its files under ./indices
+    tmp_dir = tempfile.TemporaryDirectory()
+    cwd = os.getcwd()
+    os.chdir(tmp_dir.name)
+    unittest.addModuleCleanup(tmp_dir.cleanup)
+    unittest.addModuleCleanup(os.chdir, cwd)
+
+def _random_query(rng: random.Random, terms, depth: int = 3, phrases: bool = True) -> str:
+    """Random query string over terms, with NOT and optionally phrases of the first few terms."""
+    r = rng.random()
+    if depth == 0 or r < 0.3:
+        return f'"{rng.choice(terms)}"'
+    if phrases and r < 0.4:
+        return f'"{" ".join(rng.choices(terms[:4], k=rng.randint(2, 3)))}"'
+    if r < 0.5:
+        return f'NOT ({_random_query(rng, terms, depth - 1, phrases)})'
+    op = 'AND' if r < 0.75 else 'OR'
+    return f'({_random_query(rng, terms, depth - 1, phrases)} {op} {_random_query(rng, terms, depth - 1, phrases)})'
+
+class BruteForceIndex:
+    """Term occurrences per document, searched by scanning every document."""
+    
+    def __init__(self, docs):
+        """
+        Args:
+            docs: (doc_id, text) pairs, in indexing order
+        """
+        self.doc_count = len(docs)
+        self.lengths = []
+        self.occurrences = defaultdict(dict)  # term -> doc -> positions
+        for doc, (_, text) in enumerate(docs):
+            tokens = preprocess(text)
+            self.lengths.append(len(tokens))
+            for position, token in enumerate(tokens):
+                self.occurrences[token].setdefault(doc, []).append(position)
+    
+    def matches(self, node) -> set:
+        """Documents matching a parsed query under boolean semantics."""
+        if isinstance(node, TermNode):
+            return set(self.occurrences.get(node.term.lower(), {}))
+        if isinstance(node, PhraseNode):
+            terms = [term.lower() for term in node.terms]
+            return {doc for doc in range(self.doc_count)
+                    if any(all(start + i in self.occurrences.get(term, {}).get(doc, ())
+                               for i, term in enumerate(terms))
+                           for start in self.occurrences.get(terms[0], {}).get(doc, ()))}
+        if isinstance(node, NotNode):
+            return set(range(self.doc_count)) - self.matches(node.child)
+        if isinstance(node, AndNode):
+            return self.matches(node.left) & self.matches(node.right)
+        if isinstance(node, OrNode):
+            return self.matches(node.left) | self.matches(node.right)
+        return set()
+    
+    def score(self, term: str, doc: int, info: str) -> float:
+        """A term's WORDCOUNT or TFIDF score in doc."""
+        postings = self.occurrences.get(term, {})
+        count = len(postings.get(doc, ()))
+        if info == 'WORDCOUNT':
+            return count
+        return count / self.lengths[doc] * math.log(self.doc_count / len(postings)) if count else 0.0
+    
+    def ranked(self, node, info: str):
+        """(doc, score) of documents containing any query term, best first, ties by doc.
+        
+        DAAT ranks by the summed scores of the query's terms, ignoring operators and phrases.
+        """
+        terms = set()
+        def collect(n):
+            if isinstance(n, TermNode):
+                terms.add(n.term.lower())
+            elif isinstance(n, (AndNode, OrNode)):
+                collect(n.left)
+                collect(n.right)
+            elif isinstance(n, NotNode):
+                collect(n.child)
+        collect(node)
+        
+        docs = {doc for term in terms for doc in self.occurrences.get(term, {})}
+        scores = {doc: sum(self.score(term, doc, info) for term in terms) for doc in docs}
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0])), terms
+
+class TestSelfIndexQueries(unittest.TestCase):
+    """TAAT and DAAT results of built and reloaded indices, for every compression and datastore."""
+    
+    @classmethod
+    def setUpClass(cls):
+        rng = random.Random(0)
+        cls.docs = [(f'doc{i}', ' '.join(rng.choices(VOCAB, WEIGHTS, k=rng.randint(1, 40))) + ' the of')
+                    for i in range(600)]
+        cls.reference = BruteForceIndex(cls.docs)
+        cls.queries = [_random_query(rng, VOCAB + ['missing']) for _ in range(150)]
+        cls.queries += ['"alpha"', '"kappa"', '"missing"', '"alpha" OR "beta"', '"alpha beta"']
+        cls.parser = QueryParser()
+    
+    def load(self, info: str, compr: str, dstore: str, optim: str):
+        """Build an index of self.docs, then load it into a TAAT and a DAAT index."""
+        builder = MySelfIndex('SelfIndex', info, dstore, 'TERMatat', compr, optim, build_workers=1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            builder.create_index('test', self.docs)
+        # Large postings must exercise the DB1 postings file as well as inline blobs
+        if dstore == 'DB1' and compr == 'NONE':
+            self.assertGreater(os.path.getsize(builder.base_dir / 'test_postings.dat'), 0)
+        path = str(builder.index_path('test'))
+        
+        loaded = []
+        for qproc in ('TERMatat', 'DOCatat'):
+            index = MySelfIndex('SelfIndex', info, dstore, qproc, compr, optim)
+            index.load_index(path)
+            loaded.append(index)
+        return loaded
+    
+    def assert_taat(self, index: MySelfIndex):
+        for query in self.queries:
+            expected = sorted(self.reference.matches(self.parser.parse(query)))[:_MAX_RESULTS]
+            results = json.loads(index.query(query))
+            self.assertEqual([r['doc_id'] for r in results], [self.docs[doc][0] for doc in expected], query)
+    
+    def assert_daat(self, index: MySelfIndex, info: str):
+        for query in self.queries:
+            ranked, terms = self.reference.ranked(self.parser.parse(query), info)
+            results = json.loads(index.query(query))
+            self.assertEqual(len(results), min(len(ranked), _MAX_RESULTS), query)
+            
+            if info == 'WORDCOUNT':
+                expected = [(self.docs[doc][0], score) for doc, score in ranked[:_MAX_RESULTS]]
+                self.assertEqual([(r['doc_id'], r['score']) for r in results], expected, query)
+                continue
+            
+            # TF-IDF scores are 8-bit quantized per list: allow half a step per
+            # query term, both in each result's score and in the scores by rank
+            tolerance = sum(max(self.reference.score(term, doc, info)
+                                for doc in self.reference.occurrences.get(term, {0: ()}))
+                            for term in terms) / 255 / 2 * 1.001
+            doc_ints = {doc_id: doc for doc, (doc_id, _) in enumerate(self.docs)}
+            for rank, result in enumerate(results):
+                exact = sum(self.reference.score(term, doc_ints[result['doc_id']], info) for term in terms)
+                self.assertAlmostEqual(result['score'], exact, delta=tolerance, msg=query)
+                self.assertAlmostEqual(result['score'], ranked[rank][1], delta=2 * tolerance, msg=query)
+            self.assertEqual([r['score'] for r in results], sorted((r['score'] for r in results), reverse=True))
+    
+    def test_queries(self):
+        for dstore in ('CUSTOM', 'DB1'):
+            for compr in ('NONE', 'CODE', 'CLIB'):
+                for info in ('BOOLEAN', 'WORDCOUNT', 'TFIDF'):
+                    for optim in ('Null', 'Skipping'):
+                        with self.subTest(dstore=dstore, compr=compr, info=info, optim=optim):
+                            taat, daat = self.load(info, compr, dstore, optim)
+                            self.assert_taat(taat)
+                            if info != 'BOOLEAN':
+                                self.assert_daat(daat, info)
+                            taat.delete_index('test')
+                            daat.delete_index('test')
+
+class TestQueryEngine(unittest.TestCase):
+    """QueryEngine on in-memory columnar postings."""
+    
+    def random_index(self, rng: np.random.Generator, doc_count: int, quantized: bool):
+        """Terms t0.. with document frequencies from none to every document."""
+        index = {}
+        for t, df in enumerate([0, 1, 2, doc_count // 50, doc_count // 8, doc_count // 3, doc_count]):
+            docs = np.sort(rng.choice(doc_count, df, replace=False)).astype(np.int32)
+            counts = rng.integers(1, 4, df).astype(np.int32)
+            if quantized:
+                scores = dequantize_scores(quantize_scores(rng.exponential(1.0, df)), df)
+            else:
+                scores = rng.integers(1, 6, df).astype(np.int32)
+            index[f't{t}'] = ColumnarPostings(docs, scores, counts, np.zeros(int(counts.sum()), dtype=np.int32))
+        return index
+    
+    def test_taat(self):
+        rng = np.random.default_rng(0)
+        parser = QueryParser()
+        words = random.Random(0)
+        for doc_count in (10, 1000):
+            index = self.random_index(rng, doc_count, quantized=False)
+            reference = {term: set(postings.doc_ids.tolist()) for term, postings in index.items()}
+            terms = list(index) + ['missing']
+            
+            def matches(node):
+                if isinstance(node, TermNode):
+                    return reference.get(node.term, set())
+                if isinstance(node, NotNode):
+                    return set(range(doc_count)) - matches(node.child)
+                if isinstance(node, AndNode):
+                    return matches(node.left) & matches(node.right)
+                return matches(node.left) | matches(node.right)
+            
+            for use_skip_pointers in (False, True):
+                engine = QueryEngine(index, doc_count, use_skip_pointers)
+                for _ in range(300):
+                    node = parser.parse(_random_query(words, terms, phrases=False))
+                    got = [doc for doc, _ in engine.execute(node, 'TAAT')]
+                    self.assertEqual(got, sorted(matches(node)), node)
+    
+    def test_daat_top_k(self):
+        rng = np.random.default_rng(1)
+        parser = QueryParser()
+        for quantized in (False, True):
+            for doc_count in (10, 1000):
+                index = self.random_index(rng, doc_count, quantized)
+                engine = QueryEngine(index, doc_count)
+                for _ in range(100):
+                    terms = rng.choice(len(index) + 1, rng.integers(1, 5), replace=False)
+                    query = ' OR '.join(f'"t{t}"' for t in terms)
+                    
+                    totals = defaultdict(float)
+                    for t in terms:
+                        postings = index.get(f't{t}')
+                        if postings is not None:
+                            for doc, score in zip(postings.doc_ids.tolist(), postings.scores.tolist()):
+                                totals[doc] += score
+                    ranked = sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+                    
+                    for k in (1, 3, 10, 100, None):
+                        results = engine.execute(parser.parse(query), 'DAAT', k=k)
+                        self.assertEqual(len(results), len(ranked[:k]), (query, k))
+                        if not quantized:
+                            self.assertEqual(results, ranked[:k], (query, k))
+                            continue
+                        # Float sums may differ in the last bits, so equal totals can tie either way
+                        for (doc, score), (_, expected) in zip(results, ranked):
+                            self.assertAlmostEqual(score, totals[doc], places=9)
+                            self.assertAlmostEqual(score, expected, places=9)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+Tests for MySelfIndex postings compression.
+"""
+import os
+import struct
+import tempfile
+import unittest
+import numpy as np
+from postings import ColumnarPostings
+from self_index import MySelfIndex
+
+def setUpModule():
+    # MySelfIndex keeps its files under ./indices
+    tmp_dir = tempfile.TemporaryDirectory()
+    cwd = os.getcwd()
+    os.chdir(tmp_dir.name)
+    unittest.addModuleCleanup(tmp_dir.cleanup)
+    unittest.addModuleCleanup(os.chdir, cwd)
+
+def _columnar(doc_ids, rng: np.random.Generator, info: str) -> ColumnarPostings:
+    """Random columnar postings for the given sorted doc ids."""
+    doc_ids = np.asarray(doc_ids, dtype=np.int32)
+    counts = rng.integers(1, 6, len(doc_ids)).astype(np.int32)
+    positions = np.concatenate([np.sort(rng.choice(5000, count, replace=False))
+                                for count in counts.tolist()] or [[]]).astype(np.int32)
+    if info == 'BOOLEAN':
+        scores = None
+    elif info == 'WORDCOUNT':
+        scores = counts
+    else:
+        scores = rng.exponential(1.0, len(doc_ids))
+    return ColumnarPostings(doc_ids, scores, counts, positions)
+
+class TestPostingsCompression(unittest.TestCase):
+    """_compress_postings / _decompress_postings round trips."""
+    
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+    
+    def assert_round_trip(self, index: MySelfIndex, postings: ColumnarPostings):
+        decoded = index._decompress_postings(index._compress_postings(postings))
+        np.testing.assert_array_equal(decoded.doc_ids, postings.doc_ids)
+        np.testing.assert_array_equal(decoded.counts, postings.counts)
+        np.testing.assert_array_equal(decoded.positions, postings.positions)
+        if postings.scores is None:
+            self.assertIsNone(decoded.scores)
+        else:
+            top = postings.scores.max(initial=0)
+            np.testing.assert_allclose(decoded.scores, postings.scores, rtol=0, atol=top / 255 / 2 * 1.0001)
+        return decoded
+    
+    def test_round_trip(self):
+        for info in ('BOOLEAN', 'WORDCOUNT', 'TFIDF'):
+            for compr in ('NONE', 'CODE', 'CLIB'):
+                index = MySelfIndex('SelfIndex', info, 'CUSTOM', 'TERMatat', compr, 'Null')
+                for n in (0, 1, 5, 300, 3000):
+                    with self.subTest(info=info, compr=compr, n=n):
+                        doc_ids = np.sort(self.rng.choice(10 ** 6, n, replace=False))
+                        self.assert_round_trip(index, _columnar(doc_ids, self.rng, info))
+    
+    def test_skips(self):
+        index = MySelfIndex('SelfIndex', 'WORDCOUNT', 'CUSTOM', 'TERMatat', 'CODE', 'Skipping')
+        postings = _columnar(np.arange(0, 90, 3), self.rng, 'WORDCOUNT')
+        decoded = index._decompress_postings(index._compress_postings(postings))
+        self.assertEqual([posting for posting, _ in decoded], list(postings))
+
+class TestCodeDocBitmap(unittest.TestCase):
+    """CODE compression's dense doc id bitmap branch."""
+    
+    def setUp(self):
+        self.rng = np.random.default_rng(1)
+        self.index = MySelfIndex('SelfIndex', 'WORDCOUNT', 'CUSTOM', 'TERMatat', 'CODE', 'Null')
+    
+    def bitmap_len(self, compressed: bytes) -> int:
+        """Doc bitmap length from a _vbyte_encode header."""
+        return struct.unpack_from('<IIII', compressed)[2]
+    
+    def test_dense_uses_bitmap(self):
+        for doc_ids in (np.arange(1000), np.flatnonzero(self.rng.random(5000) < 0.3), [0], [7]):
+            postings = _columnar(doc_ids, self.rng, 'WORDCOUNT')
+            compressed = self.index._compress_postings(postings)
+            # One bit per doc id up to the last one
+            self.assertEqual(self.bitmap_len(compressed), (int(postings.doc_ids[-1]) >> 3) + 1)
+            self.assertLessEqual(self.bitmap_len(compressed), len(postings))
+            np.testing.assert_array_equal(self.index._decompress_postings(compressed).doc_ids, postings.doc_ids)
+    
+    def test_sparse_uses_gaps(self):
+        for doc_ids in (np.arange(0, 100000, 9), [8], [10 ** 6]):
+            postings = _columnar(doc_ids, self.rng, 'WORDCOUNT')
+            compressed = self.index._compress_postings(postings)
+            self.assertEqual(self.bitmap_len(compressed), 0)
+            np.testing.assert_array_equal(self.index._decompress_postings(compressed).doc_ids, postings.doc_ids)
+    
+    def test_density_boundary(self):
+        # 8 docs up to id 63 fit an 8 byte bitmap, one byte per doc; 8 docs up
+        # to id 71 would need 9 bytes, so their gaps are encoded instead
+        at_limit = np.arange(0, 64, 8) + 7
+        self.assertTrue(self.bitmap_len(self.index._compress_postings(_columnar(at_limit, self.rng, 'WORDCOUNT'))))
+        below_limit = np.arange(0, 72, 9) + 8
+        self.assertFalse(self.bitmap_len(self.index._compress_postings(_columnar(below_limit, self.rng, 'WORDCOUNT'))))
+    
+    def test_bitmap_round_trip(self):
+        for info in ('BOOLEAN', 'WORDCOUNT', 'TFIDF'):
+            index = MySelfIndex('SelfIndex', info, 'CUSTOM', 'TERMatat', 'CODE', 'Null')
+            postings = _columnar(np.flatnonzero(self.rng.random(2000) < 0.5), self.rng, info)
+            compressed = index._compress_postings(postings)
+            self.assertTrue(self.bitmap_len(compressed))
+            decoded = index._decompress_postings(compressed)
+            self.assertEqual([p[0] for p in decoded], postings.doc_ids.tolist())
+            self.assertEqual([p[-1] for p in decoded], [p[-1] for p in postings])
+            np.testing.assert_array_equal(decoded.counts, postings.counts)
+
+if __name__ == '__main__':
+    unittest.main()
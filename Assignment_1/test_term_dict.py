@@ -0,0 +1,69 @@
+"""
+Tests for the packed term dictionary index file.
+"""
+import tempfile
+import unittest
+from pathlib import Path
+from term_dict import TermDictionary
+
+class TestTermDictionary(unittest.TestCase):
+    """Lookups in a written and mapped TermDictionary."""
+    
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = Path(tmp_dir.name) / 'test_index.bin'
+        
+        # Includes an empty blob, a multi-byte UTF-8 term and a term prefixing another
+        self.index = {'data': b'\x01\x02', 'apple': b'first', 'zoo': b'last', 'datum': b'',
+                      'café': b'\xff' * 100, 'dat': b'x'}
+        TermDictionary.write(self.path, self.index)
+        self.terms = TermDictionary.load(self.path)
+    
+    def test_lookup(self):
+        for term, blob in self.index.items():
+            self.assertIn(term, self.terms)
+            self.assertEqual(bytes(self.terms[term]), blob)
+        self.assertEqual(len(self.terms), len(self.index))
+        self.assertEqual(list(self.terms), sorted(self.index))
+    
+    def test_boundary_terms(self):
+        # First and last keys, and misses sorting before the first, after the
+        # last, and between or as prefixes of stored keys
+        self.assertEqual(bytes(self.terms['apple']), b'first')
+        self.assertEqual(bytes(self.terms['zoo']), b'last')
+        for term in ('', 'a', 'aaa', 'zooo', 'zzz', '\U0001f600', 'da', 'datu', 'data ', 'cafe'):
+            self.assertNotIn(term, self.terms)
+            with self.assertRaises(KeyError):
+                self.terms[term]
+            self.assertIsNone(self.terms.get(term))
+    
+    def test_non_str_keys(self):
+        for key in (b'apple', None, 1, ('apple',)):
+            self.assertNotIn(key, self.terms)
+            self.assertIsNone(self.terms.get(key))
+    
+    def test_empty(self):
+        TermDictionary.write(self.path, {})
+        empty = TermDictionary.load(self.path)
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(list(empty), [])
+        self.assertNotIn('apple', empty)
+        with self.assertRaises(KeyError):
+            empty['apple']
+    
+    def test_single_term(self):
+        TermDictionary.write(self.path, {'only': b'blob'})
+        single = TermDictionary.load(self.path)
+        self.assertEqual(bytes(single['only']), b'blob')
+        for term in ('a', 'onl', 'onlyx', 'z'):
+            self.assertNotIn(term, single)
+    
+    def test_rewrite_keeps_mapped_index(self):
+        # write replaces the file, so an index mapped earlier still reads its own data
+        TermDictionary.write(self.path, {'other': b'new'})
+        self.assertEqual(bytes(self.terms['zoo']), b'last')
+        self.assertEqual(list(TermDictionary.load(self.path)), ['other'])
+
+if __name__ == '__main__':
+    unittest.main()